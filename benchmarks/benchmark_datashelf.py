@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the GitRepository_Manager on synthetic datashelves
+
+A synthetic datashelf with N sources, M commits and T tags per source is
+created in a temporary folder, together with local bare repositories standing
+in for config.DATASHELF_REMOTE. The timings of the main manager operations are
+written as JSON, and can be compared against a previous result to catch
+regressions as the shelf grows. Progress output of the manager is written to
+stderr, so the JSON on stdout stays machine-readable.
+
+Usage:
+
+    python benchmarks/benchmark_datashelf.py --sources 50 --commits 5 --tags 3 \
+        --output bench.json [--baseline old_bench.json --tolerance 0.25]
+
+@author: andreasgeiges
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import git
+import pandas as pd
+
+# run from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import git_datashelf
+from git_datashelf import config, create_empty_datashelf, GitRepository_Manager
+from git_datashelf.core import get_time_string
+
+
+#%% Synthetic datashelf
+def _write_table(repoPath, version):
+    filePath = os.path.join(repoPath, "tables", "data.csv")
+    pd.DataFrame(
+        {"region": ["DEU", "FRA", "USA"], "2020": [version, version + 1, version + 2]}
+    ).to_csv(filePath, index=False)
+    return filePath
+
+
+def _write_inventory(repoPath, sourceID):
+    filePath = os.path.join(repoPath, "source_inventory.csv")
+    pd.DataFrame(
+        [
+            dict(
+                variable=f"Variable_{i}",
+                entity="DEU",
+                scenario="Historic",
+                model="",
+                source=sourceID,
+                source_year="2020",
+                unit="Mt",
+            )
+            for i in range(10)
+        ],
+        columns=config.INVENTORY_FIELDS,
+        index=[f"{sourceID}__{i}" for i in range(10)],
+    ).to_csv(filePath)
+    return filePath
+
+
+def _push_to_new_remote(repo, remotePath):
+    git.Repo.init(remotePath, bare=True)
+    origin = repo.create_remote("origin", str(remotePath))
+    branch = repo.active_branch
+    origin.push(branch, tags=True)
+    origin.fetch()
+    branch.set_tracking_branch(origin.refs[branch.name])
+
+
+def build_synthetic_datashelf(root, n_sources, n_commits, n_tags):
+    """
+    Create a datashelf with n_sources sources of n_commits commits and n_tags
+    version tags each, pushed to local bare repositories in root/remote.
+    """
+    shelf = os.path.join(root, "datashelf")
+    remote = os.path.join(root, "remote")
+    os.makedirs(remote)
+    config.DATASHELF_REMOTE = remote + os.sep
+    config.DATASHELF_REMOTE_HTTPS = remote + os.sep
+
+    create_empty_datashelf(shelf)
+
+    # remote catalog, cloned before the first manager start so that no
+    # background check for remote data is started
+    work = os.path.join(root, "remote_sources_work")
+    repo = git.Repo.init(work)
+    with open(os.path.join(work, "source_states.csv"), "w") as f:
+        f.write("SOURCE_ID,git_commit_hash,tag,last_to_update\n")
+    repo.index.add(["source_states.csv"])
+    repo.index.commit("initial source states")
+    _push_to_new_remote(repo, os.path.join(remote, "remote_sources.git"))
+    git.Repo.clone_from(
+        os.path.join(remote, "remote_sources.git"), os.path.join(shelf, "remote_sources")
+    )
+    with open(os.path.join(shelf, "remote_sources", "last_accessed_remote"), "w") as f:
+        f.write(get_time_string())
+
+    manager = GitRepository_Manager(shelf)
+    sourceIDs = [f"SOURCE_{i:04d}_2020" for i in range(n_sources)]
+    states = list()
+    for sourceID in sourceIDs:
+        repoPath = os.path.join(shelf, "database", sourceID)
+        manager.init_new_repo(
+            repoPath,
+            sourceID,
+            dict(
+                SOURCE_ID=sourceID,
+                collected_by="benchmark",
+                date="2024/03/19",
+                source_url="https://example.org",
+                licence="CC-BY",
+            ),
+        )
+        repo = manager.repositories[sourceID]
+        commits = list()
+        for i in range(n_commits):
+            manager.gitAddFile(sourceID, _write_table(repoPath, i))
+            if i == 0:
+                manager.gitAddFile(sourceID, _write_inventory(repoPath, sourceID))
+            manager.commit(f"update {sourceID}")
+            commits.append(repo.head.commit)
+        for t in range(n_tags):
+            repo.create_tag(f"v{t + 1}.0", ref=commits[t * len(commits) // max(n_tags, 1)])
+        manager.updateGitHash_and_Tag(sourceID)
+        _push_to_new_remote(repo, os.path.join(remote, sourceID + ".git"))
+        states.append(f"{sourceID},{repo.head.commit.hexsha},v{max(n_tags, 1)}.0,benchmark")
+    manager.gitAddFile("main", manager.cfg["SOURCE_FILE"])
+    manager.commit("update tags")
+
+    remote_sources = git.Repo(os.path.join(shelf, "remote_sources"))
+    with open(os.path.join(shelf, "remote_sources", "source_states.csv"), "a") as f:
+        f.write("\n".join(states) + "\n")
+    remote_sources.index.add(["source_states.csv"])
+    remote_sources.index.commit("add source states")
+    remote_sources.remote("origin").push()
+    return shelf, sourceIDs
+
+
+#%% Timing
+def timeit(function, repeat):
+    timings = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return dict(
+        min=min(timings),
+        median=statistics.median(timings),
+        max=max(timings),
+        repeat=repeat,
+    )
+
+
+def run_benchmarks(shelf, sourceIDs, repeat=3, n_updated=10):
+    """
+    Time the main manager operations on a synthetic datashelf.
+    """
+    results = dict()
+    updated = sourceIDs[:n_updated]
+    counter = [100]
+
+    results["startup_eager"] = timeit(lambda: GitRepository_Manager(shelf), repeat)
+    results["startup_lazy"] = timeit(lambda: GitRepository_Manager(shelf, lazy=True), repeat)
+
+    manager = GitRepository_Manager(shelf)
+    results["validate_all_sources"] = timeit(manager.validate_all_sources, repeat)
+
+    def commit():
+        counter[0] += 1
+        for sourceID in updated:
+            repoPath = os.path.join(shelf, "database", sourceID)
+            manager.gitAddFile(sourceID, _write_table(repoPath, counter[0]))
+        manager.commit("benchmark commit")
+
+    results["commit"] = timeit(commit, repeat)
+
+    results["get_tag_of_source_cold"] = timeit(
+        lambda: [GitRepository_Manager(shelf, lazy=True).get_tag_of_source(s) for s in sourceIDs[:1]],
+        repeat,
+    )
+    results["get_tag_of_source"] = timeit(
+        lambda: [manager.get_tag_of_source(sourceID) for sourceID in sourceIDs], repeat
+    )
+    results["difference_to_remote"] = timeit(manager._get_difference_to_remote, repeat)
+
+    cacheDir = os.path.join(shelf, ".git", config.INVENTORY_CACHE_DIR)
+
+    def inventory_rebuild():
+        shutil.rmtree(cacheDir, ignore_errors=True)
+        manager.inventoryEngine = None
+        manager.get_inventory_engine().table
+
+    results["inventory_rebuild"] = timeit(inventory_rebuild, repeat)
+    results["inventory_update_unchanged"] = timeit(
+        lambda: manager.get_inventory_engine().table, repeat
+    )
+    results["inventory_query"] = timeit(
+        lambda: manager.get_inventory_engine(update=False).sources_providing(
+            variable="Variable_1"
+        ),
+        repeat,
+    )
+
+    def legacy_inventory_merge():
+        inventory = pd.concat(
+            [
+                pd.read_csv(manager.get_inventory_file_of_source(sourceID), index_col=0)
+                for sourceID in sourceIDs
+            ]
+        )
+        for sourceID in updated:
+            inventory = pd.concat(
+                [
+                    inventory[inventory["source"] != sourceID],
+                    pd.read_csv(manager.get_inventory_file_of_source(sourceID), index_col=0),
+                ]
+            )
+
+    def partitioned_inventory_merge():
+        engine = manager.get_inventory_engine(update=False)
+        for sourceID in updated:
+            engine.set_partition(
+                sourceID,
+                pd.read_csv(manager.get_inventory_file_of_source(sourceID), index_col=0),
+                hexsha=manager.registry.get(sourceID, "git_commit_hash"),
+                persist=False,
+            )
+        engine.save()
+        engine.table
+
+    results["inventory_merge_legacy"] = timeit(legacy_inventory_merge, repeat)
+    results["inventory_merge_partitioned"] = timeit(partitioned_inventory_merge, repeat)
+
+    results["push_many"] = timeit(lambda: asyncio.run(manager.push_many(updated)), repeat)
+    results["pull_many"] = timeit(lambda: asyncio.run(manager.pull_many(updated)), repeat)
+    return results
+
+
+#%% Regression check
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Return the benchmarks whose median is slower than the baseline by more
+    than tolerance (relative).
+    """
+    regressions = dict()
+    for name, timing in results.items():
+        if name not in baseline:
+            continue
+        reference = baseline[name]["median"]
+        if timing["median"] > reference * (1 + tolerance):
+            regressions[name] = dict(baseline=reference, current=timing["median"])
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sources", type=int, default=20)
+    parser.add_argument("--commits", type=int, default=3)
+    parser.add_argument("--tags", type=int, default=2)
+    parser.add_argument("--updated", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic shelf")
+    args = parser.parse_args(argv)
+
+    config.DEBUG = False
+    config.CRUNCHER = "benchmark"
+    config.SOURCE_SUB_FOLDERS = ["tables", "raw_data"]
+    for variable in ["GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"]:
+        os.environ.setdefault(variable, "benchmark")
+    for variable in ["GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"]:
+        os.environ.setdefault(variable, "benchmark@example.org")
+
+    root = tempfile.mkdtemp(prefix="datashelf_benchmark_")
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            start = time.perf_counter()
+            shelf, sourceIDs = build_synthetic_datashelf(
+                root, args.sources, args.commits, args.tags
+            )
+            build_time = time.perf_counter() - start
+            results = run_benchmarks(
+                shelf, sourceIDs, repeat=args.repeat, n_updated=min(args.updated, args.sources)
+            )
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = dict(
+        parameters=dict(
+            sources=args.sources,
+            commits=args.commits,
+            tags=args.tags,
+            updated=args.updated,
+            repeat=args.repeat,
+        ),
+        environment=dict(
+            python=platform.python_version(),
+            platform=platform.platform(),
+            git=git.Git().version(),
+            git_datashelf=getattr(git_datashelf, "__version__", None),
+        ),
+        build_seconds=build_time,
+        results=results,
+    )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions:", file=sys.stderr)
+            for name, timing in regressions.items():
+                print(
+                    f"  {name}: {timing['baseline']:.4f}s -> {timing['current']:.4f}s",
+                    file=sys.stderr,
+                )
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
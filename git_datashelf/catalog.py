@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cached catalog of the remote source states in remote_sources/source_states.csv
+
+The parsed catalog is cached in the .git folder of the main repository
+together with the HEAD of the remote_sources repository. If HEAD moved, e.g.
+after a pull, and both the cached and the current source_states.csv equal
+their commits, only the rows changed in the git diff between the two commits
+are applied. Otherwise the file is parsed again.
+
+@author: andreasgeiges
+"""
+import csv
+import io
+import json
+import os
+import subprocess
+
+from . import config
+from .lazy import lazy_import
+from .tags import read_head, parse_versions
+
+pd = lazy_import("pandas")
+
+INDEX_FIELD = "SOURCE_ID"
+STATES_FILE = "source_states.csv"
+
+
+def _file_state(filePath):
+    stat = os.stat(filePath)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class RemoteCatalog:
+    """
+    Remote source states with a typed version column.
+
+    Parameters
+    ----------
+    remoteSourcesPath : str
+        Path to the remote_sources repository.
+    cacheFile : str, optional
+        The default is config.REMOTE_CATALOG_CACHE_FILE in the .git folder of
+        the datashelf containing remote_sources.
+    """
+
+    def __init__(self, remoteSourcesPath, cacheFile=None):
+        self.remoteSourcesPath = remoteSourcesPath
+        self.statesFile = os.path.join(remoteSourcesPath, STATES_FILE)
+        if cacheFile is None:
+            cacheFile = os.path.join(
+                os.path.dirname(os.path.abspath(remoteSourcesPath)),
+                ".git",
+                config.REMOTE_CATALOG_CACHE_FILE,
+            )
+        self.cacheFile = cacheFile
+
+        self.head = None
+        self.file_state = None
+        self.clean = False
+        self.columns = list()
+        self.rows = dict()
+        self._table = None
+        self._versions = None
+
+    #%% Loading
+    def load(self):
+        """
+        Bring the catalog up to date with source_states.csv, using the cache
+        or the git diff between the cached and the current HEAD if possible.
+        Returns the catalog table.
+        """
+        head = read_head(os.path.join(self.remoteSourcesPath, ".git"))
+        file_state = _file_state(self.statesFile)
+        if self.head is None:
+            self._read_cache()
+
+        if (head, file_state) == (self.head, self.file_state):
+            return self.table
+        clean = self._is_clean(head)
+        if not (clean and self.clean and self.head is not None and self._apply_diff(head)):
+            with open(self.statesFile, "r", newline="") as f:
+                self._read_rows(f)
+        self.head, self.file_state, self.clean = head, file_state, clean
+        self._changed()
+        self._save_cache()
+        return self.table
+
+    def _read_rows(self, f):
+        reader = csv.reader(f)
+        header = next(reader, [INDEX_FIELD])
+        self.columns = header[1:]
+        self.rows = {row[0]: row[1:] for row in reader if row}
+
+    def _is_clean(self, head):
+        """
+        Check if source_states.csv equals its content at commit head.
+        """
+        if head is None:
+            return False
+        proc = subprocess.run(
+            ["git", "diff", "--quiet", head, "--", STATES_FILE],
+            cwd=self.remoteSourcesPath,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        return proc.returncode == 0
+
+    def _apply_diff(self, head):
+        """
+        Apply the rows changed between the cached HEAD and head. Both commits
+        must match the cached rows and the work tree. Returns False if the
+        diff cannot be applied, e.g. because the header changed or the cached
+        HEAD is not available anymore.
+        """
+        proc = subprocess.run(
+            [
+                "git", "diff", "--no-renames", "--unified=0", self.head, head,
+                "--", STATES_FILE,
+            ],
+            cwd=self.remoteSourcesPath,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        if proc.returncode != 0:
+            return False
+
+        removed, added = list(), list()
+        for line in proc.stdout.decode().splitlines():
+            if line.startswith(("+++", "---")):
+                continue
+            if line.startswith("-"):
+                removed.append(line[1:])
+            elif line.startswith("+"):
+                added.append(line[1:])
+        header = ",".join([INDEX_FIELD] + self.columns)
+        if any(line.startswith(INDEX_FIELD + ",") or line == header for line in removed + added):
+            return False
+
+        removedIDs = {row[0] for row in csv.reader(io.StringIO("\n".join(removed))) if row}
+        addedRows = {row[0]: row[1:] for row in csv.reader(io.StringIO("\n".join(added))) if row}
+        for sourceID in removedIDs.difference(addedRows):
+            self.rows.pop(sourceID, None)
+        self.rows.update(addedRows)
+        return True
+
+    def set_committed(self):
+        """
+        Read the catalog after source_states.csv was written and committed.
+        """
+        with open(self.statesFile, "r", newline="") as f:
+            self._read_rows(f)
+        self.head = read_head(os.path.join(self.remoteSourcesPath, ".git"))
+        self.file_state = _file_state(self.statesFile)
+        self.clean = True
+        self._changed()
+        self._save_cache()
+
+    #%% Cache
+    def _read_cache(self):
+        if not os.path.exists(self.cacheFile):
+            return
+        try:
+            with open(self.cacheFile, "r") as f:
+                cache = json.load(f)
+            self.head = cache["head"]
+            self.file_state = cache["file_state"]
+            self.clean = cache["clean"]
+            self.columns = cache["columns"]
+            self.rows = cache["rows"]
+        except (ValueError, KeyError):
+            self.head = None
+            self.file_state = None
+            self.clean = False
+        self._changed()
+
+    def _save_cache(self):
+        if not os.path.isdir(os.path.dirname(self.cacheFile)):
+            return
+        tmpPath = f"{self.cacheFile}.{os.getpid()}.tmp"
+        with open(tmpPath, "w") as f:
+            json.dump(
+                dict(
+                    head=self.head,
+                    file_state=self.file_state,
+                    clean=self.clean,
+                    columns=self.columns,
+                    rows=self.rows,
+                ),
+                f,
+            )
+        os.replace(tmpPath, self.cacheFile)
+
+    #%% Views
+    def _changed(self):
+        self._table = None
+        self._versions = None
+
+    @property
+    def table(self):
+        """
+        Catalog as DataFrame indexed by SOURCE_ID (read-only).
+        """
+        if self._table is None:
+            table = pd.DataFrame.from_dict(self.rows, orient="index", columns=self.columns)
+            table = table.mask(table == "")
+            table.index.name = INDEX_FIELD
+            self._table = table
+        return self._table
+
+    @property
+    def versions(self):
+        """
+        Version numbers of the remote tags as float Series.
+        """
+        if self._versions is None:
+            if "tag" in self.columns:
+                self._versions = parse_versions(self.table["tag"])
+            else:
+                self._versions = pd.Series(dtype=float, index=self.table.index)
+        return self._versions
@@ -10,6 +10,79 @@ import os
 DEBUG = True
 MODULE_PATH = os.path.dirname(__file__)
 
+# record timed spans of all git and I/O operations of the manager
+# (see GitRepository_Manager.instrumentation)
+INSTRUMENTATION = False
+
+# number of workers for the parallel validation of all sources
+# (None uses the default of the executor)
+VALIDATION_WORKERS = None
+
+# number of threads used to commit multiple source repositories
+COMMIT_WORKERS = None
+
+# maximal number of parallel git transport processes of push_many/pull_many
+REMOTE_CONCURRENCY = 8
+
+# number of parallel clones of clone_sources_from_remote
+CLONE_WORKERS = 8
+
+# pool of persistent git cat-file processes for object reads: maximal number
+# of repositories with open processes and idle time in seconds until closing
+OBJECT_POOL_SIZE = 64
+OBJECT_POOL_IDLE_TIMEOUT = 60
+
+# memory limit in bytes of the cached tables and inventories of older source
+# versions (see GitRepository_Manager.table_at and inventory_at)
+VERSION_CACHE_MAX_BYTES = 512 * 2**20
+
+# maintenance of the repositories (see GitRepository_Manager.run_maintenance):
+# repositories with more loose objects or packs than the thresholds or without
+# maintenance for MAINTENANCE_INTERVAL seconds are maintained
+MAINTENANCE_TASKS = ['commit-graph', 'loose-objects', 'incremental-repack', 'multi-pack-index']
+MAINTENANCE_WORKERS = 4
+MAINTENANCE_MAX_LOOSE_OBJECTS = 1000
+MAINTENANCE_MAX_PACKS = 20
+MAINTENANCE_INTERVAL = 7 * 24 * 3600
+MAINTENANCE_STATE_FILE = 'datashelf_maintenance.json'
+
+# backend of the source registry holding sources.csv ("csv" or "sqlite")
+SOURCE_REGISTRY_BACKEND = 'csv'
+SOURCE_REGISTRY_DATABASE_FILE = 'datashelf_sources.sqlite'
+
+# folder of the cached inventory partitions in the .git folder of the
+# main repository
+INVENTORY_CACHE_DIR = 'datashelf_inventory'
+
+# cache of the parsed remote_sources/source_states.csv in the .git folder of
+# the main repository
+REMOTE_CATALOG_CACHE_FILE = 'datashelf_remote_catalog.json'
+
+# persist the results of clean checks in the .git folder of the main
+# repository to skip repeated dirty checks of unmodified repositories
+PERSISTENT_VALIDATION_CACHE = True
+VALIDATION_CACHE_FILE = 'datashelf_validation.json'
+
+# track modifications of the source work trees with inotify (Linux only);
+# more modified paths than WATCHER_MAX_CHANGES fall back to a full dirty check
+WATCH_WORKTREES = False
+WATCHER_MAX_CHANGES = 1000
+
+# open datashelves as read-only snapshot of the main repository commit, see
+# GitRepository_Manager(read_only=True)
+DB_READ_ONLY = False
+
+# lock files of concurrent writers in the .git folder of the main repository
+# and the timeout in seconds to acquire a lock (None waits indefinitely)
+LOCK_DIR = 'datashelf_locks'
+LOCK_TIMEOUT = None
+
+# shared object store of the sources in the .git folder of the main
+# repository (see GitRepository_Manager.share_objects); new clones borrow the
+# objects of the store if SHARED_OBJECT_STORE is True
+SHARED_OBJECT_STORE = False
+SHARED_OBJECT_STORE_DIR = 'datashelf_objects.git'
+
 SOURCE_META_FIELDS = [
     'SOURCE_ID',
     'collected_by',
@@ -6,19 +6,40 @@ Created on Tue Mar 19 09:46:48 2024
 @author: andreasgeiges
 """
 import csv
+import io
 import os
 import time
-import pandas as pd
-import numpy as np
-import git
-import tabulate
 import traceback
+import warnings
 
 from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
 from collections import defaultdict
 from pathlib import Path
 
 from . import config
+from .lazy import lazy_import
+from .validation import validate_sources, ValidationCache, repository_fingerprint
+from .catalog import RemoteCatalog
+from .registry import get_source_registry, SnapshotRegistry
+from .inventory import InventoryEngine, read_source_inventory
+from .objects import ObjectPool
+from .instrumentation import Instrumentation
+from .remote import run_git, run_git_commands, raise_git_failures
+from .tags import TagIndex, read_head, version_of_tag, parse_versions
+from .locking import DatashelfLocks
+from .maintenance import MaintenanceScheduler
+from .objectstore import SharedObjectStore
+from .staging import stage_files
+from .tables import write_chunked_table, read_chunked_table
+from .versions import VersionCache
+from .history import commit_history, changed_paths
+from .watcher import WorktreeWatcher, inotify_available
+
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+git = lazy_import("git")
+tabulate = lazy_import("tabulate")
 
 
 #%% Functions 
@@ -54,6 +75,44 @@ def csv_to_dict(filePath):
             mydict[row[0]] = row[1]
     return mydict
 
+def progress_printer():
+    """
+    Return a progress printer of git transport operations. GitPython and tqdm
+    are only imported on first use.
+    """
+    from .progress import TqdmProgressPrinter
+
+    return TqdmProgressPrinter()
+
+#%% Lazy repository mapping
+class LazyRepositoryDict(dict):
+    """
+    Dictionary of git repositories that opens and verifies a source repository
+    the first time it is requested instead of at manager startup.
+    """
+
+    def __init__(self, manager):
+        super().__init__()
+        self.manager = manager
+
+    def __missing__(self, sourceID):
+        if sourceID not in self.manager.registry:
+            raise KeyError(sourceID)
+
+        repoPath = os.path.join(
+            self.manager.cfg['PATH_TO_DATASHELF'], "database", sourceID
+        )
+        with self.manager.instrumentation.span("open_repo", sourceID):
+            self[sourceID] = git.Repo(repoPath)
+        if self.manager.read_only:
+            return self[sourceID]
+        try:
+            self.manager.verifyGitHash(sourceID)
+        except Exception:
+            del self[sourceID]
+            raise
+        return dict.__getitem__(self, sourceID)
+
 #%% Git Repository Manager
 class GitRepository_Manager:
     """
@@ -63,7 +122,33 @@ class GitRepository_Manager:
     #%% Magicc methods
     def __init__(self, 
                  path_to_repo,
-                 debugmode=False):
+                 debugmode=False,
+                 lazy=False,
+                 watch=None,
+                 read_only=None,
+                 snapshot=None):
+        """
+        Parameters
+        ----------
+        path_to_repo : str
+            Path to the datashelf.
+        debugmode : bool, optional
+            Skip opening and validating any repository. The default is False.
+        lazy : bool, optional
+            Open and hash-verify source repositories on first access instead
+            of at startup. The default is False.
+        watch : bool, optional
+            Track modifications of the source work trees with inotify (Linux
+            only), see start_watcher. The default is config.WATCH_WORKTREES.
+        read_only : bool, optional
+            Open a read-only snapshot of the datashelf: sources.csv and the
+            source data are read from the git object database at the pinned
+            main commit, without validation, remote checks or locks. The
+            default is config.DB_READ_ONLY.
+        snapshot : str, optional
+            Commit sha or tag of the main repository pinned in read-only
+            mode. The default is the current HEAD.
+        """
         
         # config
         self.cfg = dict(
@@ -71,16 +156,23 @@ class GitRepository_Manager:
             PATH_TO_DATASHELF = path_to_repo,
             SOURCE_FILE = os.path.join(path_to_repo, 'sources.csv'),
             )
+        self.instrumentation = Instrumentation(enabled=config.INSTRUMENTATION)
+        self.objectPool = ObjectPool()
+        self.versionCache = VersionCache()
+        self.read_only = config.DB_READ_ONLY if read_only is None else read_only
+        self.snapshot = None
+        if self.read_only:
+            self._init_snapshot(snapshot)
+            return
         
-        
-        self.sources = pd.read_csv(self.cfg['SOURCE_FILE'], index_col="SOURCE_ID")
+        with self.instrumentation.span("read_sources_csv"):
+            self.registry = get_source_registry(self.cfg['SOURCE_FILE'])
 
-        remote_repo_path = os.path.join(
-            self.cfg['PATH_TO_DATASHELF'], "remote_sources", "source_states.csv"
+        self.remote_catalog = RemoteCatalog(
+            os.path.join(self.cfg['PATH_TO_DATASHELF'], "remote_sources")
         )
-        if os.path.exists(remote_repo_path):
-            self.remote_sources = pd.read_csv(remote_repo_path, index_col=0)
-            
+        if os.path.exists(self.remote_catalog.statesFile):
+            self._load_remote_catalog()
             
             new_items, updated_items = self._get_difference_to_remote()
             n_new_entries = len(new_items)
@@ -97,20 +189,36 @@ class GitRepository_Manager:
         else:
             print('Remote: not setup')
         
-        self.repositories = dict()
+        if lazy:
+            self.repositories = LazyRepositoryDict(self)
+        else:
+            self.repositories = dict()
         self.updatedRepos = set()
         self.validatedRepos = set()
         self.filesToAdd = defaultdict(list)
+        self.tagIndices = dict()
+        self.inventoryEngine = None
+        self.locks = DatashelfLocks(self.cfg['PATH_TO_DATASHELF'])
+        self.objectStore = SharedObjectStore(self.cfg['PATH_TO_DATASHELF'])
+        if config.PERSISTENT_VALIDATION_CACHE:
+            self.validation_cache = ValidationCache(self.cfg['PATH_TO_DATASHELF'])
+        else:
+            self.validation_cache = None
+        self.watcher = None
+        if config.WATCH_WORKTREES if watch is None else watch:
+            self.start_watcher()
         
         # remote update checks (only once per day)
         self._init_remote_repo()
         
         
         if not debugmode:
-            for sourceID in self.sources.index:
-                repoPath = os.path.join( self.cfg['PATH_TO_DATASHELF'], "database", sourceID)
-                self.repositories[sourceID] = git.Repo(repoPath)
-                self.verifyGitHash(sourceID)
+            if not lazy:
+                for sourceID in self.registry:
+                    repoPath = os.path.join( self.cfg['PATH_TO_DATASHELF'], "database", sourceID)
+                    with self.instrumentation.span("open_repo", sourceID):
+                        self.repositories[sourceID] = git.Repo(repoPath)
+                    self.verifyGitHash(sourceID)
 
             self.repositories["main"] = git.Repo( self.cfg['PATH_TO_DATASHELF'])
             self._validateRepository("main")
@@ -119,15 +227,71 @@ class GitRepository_Manager:
 
         self.check_for_new_remote_data()
         
+    def _init_snapshot(self, snapshot):
+        """
+        Private
+        Initialize the read-only snapshot mode pinned to a main commit.
+        """
+        self.snapshot, self.registry = self._read_registry_at(snapshot or "HEAD")
+
+        # no remote data in read-only mode (and pandas is not loaded)
+        self.remote_sources = None
+        self.repositories = LazyRepositoryDict(self)
+        self.updatedRepos = set()
+        self.validatedRepos = set()
+        self.filesToAdd = defaultdict(list)
+        self.tagIndices = dict()
+        self.inventoryEngine = None
+        self.locks = None
+        self.objectStore = None
+        self.validation_cache = None
+        self.watcher = None
+
+    def _read_registry_at(self, commit):
+        """
+        Private
+        Return the commit sha and the read-only registry of sources.csv at a
+        commit of the main repository.
+        """
+        git_dir = os.path.join(self.cfg['PATH_TO_DATASHELF'], ".git")
+        catFile = self.objectPool.get(git_dir)
+        info = catFile.info(commit + "^{commit}")
+        if info is None:
+            raise KeyError(f"Commit {commit} does not exist in the datashelf")
+
+        with self.instrumentation.span("read_sources_csv"):
+            result = catFile.read(f"{info[0]}:sources.csv")
+        if result is None:
+            raise FileNotFoundError(f"sources.csv does not exist at commit {info[0]}")
+        return info[0], SnapshotRegistry(self.cfg['SOURCE_FILE'], result[2])
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError(
+                f"The datashelf was opened read-only at snapshot {self.snapshot}"
+            )
+
     def __getitem__(self, sourceID):
         """
         Retrieve `sourceID` from repositories dictionary and ensure cleanliness
         """
         repo = self.repositories[sourceID]
+        if self.read_only:
+            return repo
         if sourceID not in self.validatedRepos:
             self._validateRepository(sourceID)
+        elif self.watcher is not None:
+            self._check_watched_changes(sourceID)
         return repo
 
+    @property
+    def sources(self):
+        """
+        Read-only view of sources.csv as DataFrame indexed by SOURCE_ID.
+        Use self.registry.upsert to modify sources.
+        """
+        return self.registry.to_dataframe()
+
     #%% Private methods
     
     def _ssh_agent_running(self):
@@ -137,20 +301,28 @@ class GitRepository_Manager:
         (out, err) = proc.communicate()
         return not out.startswith(b'The agent has no identities')
 
+    def _load_remote_catalog(self):
+        """
+        Private
+        Update self.remote_sources from the cached remote catalog, parsing
+        only the rows of source_states.csv that changed.
+        """
+        with self.instrumentation.span("read_source_states"):
+            self.remote_sources = self.remote_catalog.load()
+        return self.remote_sources
+
     def _get_difference_to_remote(self):
         
         new_items = self.remote_sources.index.difference(
             self.sources.index
         )
-        compare_df = self.sources.copy()
-        compare_df['remote_tag'] = self.remote_sources['tag']
-        compare_df = compare_df[(~compare_df.tag.isnull()) &(~compare_df.remote_tag.isnull())]
-        
-        updated_items = compare_df.index[(
-            compare_df.tag.apply(lambda x : float(x[1:])) < compare_df.remote_tag.apply(lambda x : float(x[1:]))
-            )]
-        
-        
+        if len(self.remote_sources) == 0:
+            return new_items, self.sources.index[:0]
+
+        # typed version numbers, missing tags compare as False
+        local_versions = parse_versions(self.sources['tag'])
+        remote_versions = self.remote_catalog.versions.reindex(self.sources.index)
+        updated_items = self.sources.index[(local_versions < remote_versions).to_numpy()]
         
         return new_items, updated_items
     
@@ -166,13 +338,7 @@ class GitRepository_Manager:
         remote_repo_path = os.path.join(self.cfg['PATH_TO_DATASHELF'], "remote_sources")
         if os.path.exists(remote_repo_path):
             self.remote_repo = self._get_remote_sources_repo()
-            
-            dpath = os.path.join(
-            self.cfg['PATH_TO_DATASHELF'],
-            "remote_sources",
-            "source_states.csv",
-                )
-            self.remote_sources = pd.read_csv(dpath, index_col=0)
+            self._load_remote_catalog()
         else:
             #create empty dummy
             self.remote_sources = pd.DataFrame()
@@ -190,7 +356,8 @@ class GitRepository_Manager:
             # pull
             remote_repo_path = os.path.join(self.cfg['PATH_TO_DATASHELF'], "remote_sources")
             remote_repo = git.Repo(remote_repo_path)
-            remote_repo.remote("origin").pull(progress=TqdmProgressPrinter())
+            with self.instrumentation.span("pull", "remote_sources"):
+                remote_repo.remote("origin").pull(progress=progress_printer())
 
         else:
             # clone
@@ -198,17 +365,19 @@ class GitRepository_Manager:
 
         self._update_last_remote_access()
         self.remote_repo = remote_repo
+        self._load_remote_catalog()
 
         return remote_repo
 
     def _clone_remote_sources(self):
 
         url = config.DATASHELF_REMOTE + "remote_sources.git"
-        remote_repo = git.Repo.clone_from(
-            url=url,
-            to_path=os.path.join(self.cfg['PATH_TO_DATASHELF'], "remote_sources"),
-            progress=TqdmProgressPrinter(),
-        )
+        with self.instrumentation.span("clone", "remote_sources"):
+            remote_repo = git.Repo.clone_from(
+                url=url,
+                to_path=os.path.join(self.cfg['PATH_TO_DATASHELF'], "remote_sources"),
+                progress=progress_printer(),
+            )
         self._update_last_remote_access()
 
         return remote_repo
@@ -235,56 +404,141 @@ class GitRepository_Manager:
         
         repo = self.repositories[repoName]
         tag = self.get_tag_of_source(repoName)
-        self.sources.loc[repoName, "tag"] = tag
+        self.registry.upsert(repoName, {"tag": tag})
         self.commit("Update tags of sources")
 
     def _update_remote_sources(self, repoName):
 
-        dpath = os.path.join(
-            self.cfg['PATH_TO_DATASHELF'],
-            "remote_sources",
-            "source_states.csv",
-        )
-        remote_repo = git.Repo(os.path.join(self.cfg['PATH_TO_DATASHELF'], "remote_sources"))
-        rem_sources_df = pd.read_csv(dpath, index_col=0)
+        repo = self[repoName]
+        self._update_remote_source_states([repoName])
+        return repo
 
+    def _update_remote_source_states(self, repoNames):
+        """
+        Private
+        Update the remote source states of sources in a single commit. The
+        states are read, modified and committed under the remote_sources
+        lock, so concurrent writers do not drop each other's rows. Returns
+        the sources whose state changed.
+        """
+        with self.locks.lock("remote_sources"):
+            rem_sources_df = self._load_remote_catalog().copy()
+            updated = [
+                repoName
+                for repoName in repoNames
+                if self._set_remote_source_state(repoName, rem_sources_df)
+            ]
+            if updated:
+                self._commit_remote_sources(rem_sources_df)
+        return updated
+
+    def _set_remote_source_state(self, repoName, rem_sources_df):
+        """
+        Private
+        Tag the head of the source if required and update its row in the
+        remote source states. Returns False if nothing needs to be done.
+        """
         repo = self[repoName]
         hash = repo.commit().hexsha
         user = config.CRUNCHER
 
-        if len(repo.tags) == 0:
+        last_tag, tag_hash = self._get_tag_index(repo.git_dir).latest_tag()
+        if last_tag is None:
             # start new tag with version 1.0
             tag = "v1.0"
 
         else:
-            tags = sorted(repo.tags, key=lambda t: t.commit.committed_datetime)
-            last_tag = tags[-1]
-            tag_hash = last_tag.commit.hexsha
-
             if tag_hash == hash:
                 # no new commits -> keep tag
-                tag = last_tag.name
+                tag = last_tag
 
-                if rem_sources_df.loc[repoName, "tag"] == tag:
+                if (repoName in rem_sources_df.index) and (
+                    rem_sources_df.loc[repoName, "tag"] == tag
+                ):
                     # nothing needs to be done
-                    return repo
+                    return False
             else:
                 # there are new commits -> increase version by 1.0
+                tag = f'v{version_of_tag(last_tag)+1:1.1f}'
 
-                latest_tag = tags[-1]
-                tag = f'v{float(latest_tag.name.replace("v",""))+1:1.1f}'
+        if tag != last_tag:
+            repo.create_tag(tag)
 
-        # update remote sources csv
-        repo.create_tag(tag)
-        
         rem_sources_df.loc[repoName, :] = (hash, tag, user)
-        rem_sources_df.to_csv(dpath)
-        
-        remote_repo.index.add("source_states.csv")
-        remote_repo.index.commit("remote source update" + " by " + config.CRUNCHER)
-        
-        self.remote_sources = rem_sources_df
-        return repo
+        return True
+
+    def _commit_remote_sources(self, rem_sources_df):
+        """
+        Private
+        Write and commit the remote source states. The caller holds the
+        remote_sources lock.
+        """
+        dpath = os.path.join(
+            self.cfg['PATH_TO_DATASHELF'],
+            "remote_sources",
+            "source_states.csv",
+        )
+        remote_repo = git.Repo(os.path.join(self.cfg['PATH_TO_DATASHELF'], "remote_sources"))
+        with self.instrumentation.span("write_source_states"):
+            rem_sources_df.to_csv(dpath)
+
+        with self.instrumentation.span("index_add", "remote_sources"):
+            remote_repo.index.add("source_states.csv")
+        with self.instrumentation.span("index_commit", "remote_sources"):
+            remote_repo.index.commit("remote source update" + " by " + config.CRUNCHER)
+
+        self.remote_catalog.set_committed()
+        self.remote_sources = self.remote_catalog.table
+
+    def _commit_source(self, repo, filesToAdd, message):
+        """
+        Private
+        Add and commit the files of one source repository. Runs in a worker
+        thread of commit and only touches the given repository.
+
+        Returns
+        -------
+        previous_hexsha, hexsha, tag : tuple
+        """
+        try:
+            previous_hexsha = repo.head.commit.hexsha
+        except ValueError:
+            # repository without commits
+            previous_hexsha = None
+        sourceID = os.path.basename(repo.working_dir)
+        with self.instrumentation.span("index_add", sourceID):
+            stage_files(repo, filesToAdd)
+        with self.instrumentation.span("index_commit", sourceID):
+            commit = repo.index.commit(message)
+        return previous_hexsha, commit.hexsha, self._get_tag_of_head(repo)
+
+    def _undo_commit(self, repo, previous_hexsha):
+        """
+        Private
+        Move HEAD back to previous_hexsha while keeping the index, so that the
+        staged files are committed again by the next commit.
+        """
+        if previous_hexsha is None:
+            repo.git.update_ref("-d", "HEAD")
+        else:
+            repo.head.reset(previous_hexsha, index=False, working_tree=False)
+
+    def _get_tag_index(self, git_dir):
+        """
+        Private
+        Return the up-to-date tag index of the repository at git_dir
+        """
+        tagIndex = self.tagIndices.get(git_dir)
+        if tagIndex is None:
+            tagIndex = TagIndex(git_dir, objectPool=self.objectPool)
+            self.tagIndices[git_dir] = tagIndex
+        with self.instrumentation.span(
+            "tag_index", os.path.basename(os.path.dirname(git_dir))
+        ):
+            return tagIndex.refresh()
+
+    def _get_tag_of_head(self, repo):
+        return self._get_tag_index(repo.git_dir).tag_at(read_head(repo.git_dir))
 
     def _gitUpdateFile(self, repoName, filePath):
         pass
@@ -300,19 +554,153 @@ class GitRepository_Manager:
         if sourceID != "main":
             self.verifyGitHash(sourceID)
 
-        if repo.is_dirty():
+        if self.watcher is not None and sourceID != "main":
+            if self.watcher.is_watched(sourceID):
+                # only the paths modified since the last clean check
+                if self._changed_paths_are_clean(sourceID):
+                    self.validatedRepos.add(sourceID)
+                    return True
+            else:
+                # watch before the checks, so no modification during or after
+                # the checks is missed
+                self.watcher.watch(sourceID, repo.working_tree_dir)
+            try:
+                self._check_clean(sourceID)
+            except BaseException:
+                # the modifications of a source that failed the checks are
+                # unknown, the next validation must check it fully
+                self.watcher.unwatch(sourceID)
+                raise
+        else:
+            self._check_clean(sourceID)
+
+        if config.DEBUG:
+            print("Repo {} is clean".format(sourceID))
+        self.validatedRepos.add(sourceID)
+        return True
+
+    def _check_clean(self, sourceID):
+        """
+        Private
+        Raise if the work tree of sourceID has uncommitted modifications.
+        """
+        repo = self.repositories[sourceID]
+        if self.validation_cache is not None:
+            with self.instrumentation.span("fingerprint", sourceID):
+                fingerprint = repository_fingerprint(repo)
+            if self.validation_cache.is_clean(sourceID, fingerprint):
+                return
+
+        with self.instrumentation.span("is_dirty", sourceID):
+            is_dirty = repo.is_dirty()
+        if is_dirty:
             raise RuntimeError(
                 'Git repo: "{}" is inconsistent! - please check uncommitted modifications'.format(
                     sourceID
                 )
             )
 
-        config.DB_READ_ONLY = False
-        if config.DEBUG:
-            print("Repo {} is clean".format(sourceID))
-        self.validatedRepos.add(sourceID)
+        if self.validation_cache is not None:
+            # git may refresh the index during the dirty check
+            self.validation_cache.mark_clean(sourceID, repository_fingerprint(repo))
+
+    def _get_modified_paths(self, sourceID, paths):
+        """
+        Private
+        Return the paths that git reports as modified or untracked.
+        """
+        repo = self.repositories[sourceID]
+        modified = list()
+        paths = sorted(paths)
+        for i in range(0, len(paths), 500):
+            with self.instrumentation.span("status_paths", sourceID):
+                output = repo.git.execute(
+                    ["git", "--literal-pathspecs", "status", "--porcelain", "-z", "--"]
+                    + paths[i:i + 500]
+                )
+            modified.extend(entry[3:] for entry in output.split("\0") if entry[3:])
+        return modified
+
+    def _changed_paths_are_clean(self, sourceID):
+        """
+        Private
+        Check the paths reported by the watcher. Returns False if the
+        modifications are unknown or any path is dirty.
+        """
+        changes = self.watcher.get_changes(sourceID)
+        if changes is None or len(changes) > config.WATCHER_MAX_CHANGES:
+            return False
+        if changes and self._get_modified_paths(sourceID, changes):
+            return False
+        self.watcher.clear(sourceID, changes)
         return True
 
+    def _check_watched_changes(self, sourceID):
+        """
+        Private
+        Warn if a validated source was modified outside of the manager, i.e.
+        by files that were not passed to gitAddFile.
+        """
+        changes = self.watcher.get_changes(sourceID)
+        if not changes:
+            # nothing changed or unknown (handled by the next validation)
+            return
+        repo = self.repositories[sourceID]
+        staged = {
+            os.path.relpath(os.path.join(repo.working_tree_dir, filePath), repo.working_tree_dir)
+            for filePath in self.filesToAdd.get(sourceID, [])
+        }
+        unstaged = {
+            path
+            for path in changes
+            if not any(path == s or s.startswith(path + os.sep) for s in staged)
+        }
+        if len(unstaged) > config.WATCHER_MAX_CHANGES:
+            modified = sorted(unstaged)
+        else:
+            modified = self._get_modified_paths(sourceID, unstaged) if unstaged else []
+        self.watcher.clear(sourceID, unstaged)
+        if modified:
+            if self.validation_cache is not None:
+                self.validation_cache.invalidate(sourceID)
+            warnings.warn(
+                'Source "{}" was modified outside of the manager: {}'.format(
+                    sourceID, ", ".join(modified[:10]) + (" ..." if len(modified) > 10 else "")
+                )
+            )
+
+    def start_watcher(self):
+        """
+        Track modifications of the source work trees with inotify, so that
+        re-validations only check the modified paths and modifications of
+        validated sources outside of the manager are reported on access.
+        Returns False if inotify is not available.
+        """
+        if self.watcher is not None:
+            return True
+        if not inotify_available():
+            warnings.warn("inotify is not available, work trees are not watched")
+            return False
+        self.watcher = WorktreeWatcher()
+        return True
+
+    def stop_watcher(self):
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+
+    def check_worktree_changes(self):
+        """
+        Return the paths modified since the last clean check per watched
+        source (None if unknown, e.g. after an overflow of the event queue).
+        """
+        if self.watcher is None:
+            raise RuntimeError("The work tree watcher is not running, see start_watcher")
+        return {
+            sourceID: self.watcher.get_changes(sourceID)
+            for sourceID in list(self.watcher.roots)
+        }
+
     #%% Public methods
     
     
@@ -321,7 +709,7 @@ class GitRepository_Manager:
         new_items, updated_items = self._get_difference_to_remote()
         
         print('New items:')
-        print(tabulate(
+        print(tabulate.tabulate(
             self.remote_sources.loc[new_items, ['tag', 'last_to_update']], 
             headers="keys", tablefmt="psql"))
         
@@ -332,7 +720,7 @@ class GitRepository_Manager:
                 self.sources.loc[updated_items, ['tag']].rename(columns={'tag':'local_tag'}),
                 self.remote_sources.loc[updated_items, ['tag']].rename(columns={'tag':'remote_tag'}),
             ], axis=1)
-        print(tabulate(
+        print(tabulate.tabulate(
             df, 
             headers="keys", tablefmt="psql"))
     
@@ -401,25 +789,120 @@ class GitRepository_Manager:
         repoName : str - valid repository in the remove database
         repoPath : str - path of the repository
         """
+        self._check_writable()
 
         self._pull_remote_sources()
+        repo = self._clone_source(repoName, repoPath)
+        self._register_cloned_source(repoName, repo)
+
+        return repo
+
+    def clone_sources_from_remote(self, repoNames, max_workers=None, filter=None, depth=None):
+        """
+        Clone multiple remote sources concurrently into the database. The
+        remote sources are pulled once and sources.csv is committed once after
+        all clones finished.
+
+        Parameters
+        ----------
+        repoNames : list of str
+            Valid repositories in the remote database.
+        max_workers : int, optional
+            Number of parallel clones. The default is config.CLONE_WORKERS.
+        filter : str, optional
+            Partial clone filter, e.g. "blob:none". The default is None.
+        depth : int, optional
+            Create shallow clones with the given history depth. The default
+            is None.
+
+        Returns
+        -------
+        repos : dict
+            Cloned repositories by source ID.
+
+        """
+        self._check_writable()
+        if max_workers is None:
+            max_workers = config.CLONE_WORKERS
+        clone_kwargs = dict()
+        if filter is not None:
+            clone_kwargs["filter"] = filter
+        if depth is not None:
+            clone_kwargs["depth"] = depth
+
+        self._pull_remote_sources()
+        databasePath = os.path.join(self.cfg['PATH_TO_DATASHELF'], "database")
+
+        repos = dict()
+        failures = dict()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                repoName: executor.submit(
+                    self._clone_source,
+                    repoName,
+                    os.path.join(databasePath, repoName),
+                    False,
+                    **clone_kwargs,
+                )
+                for repoName in repoNames
+            }
+            for repoName, future in futures.items():
+                try:
+                    repos[repoName] = future.result()
+                except Exception as e:
+                    failures[repoName] = e
+
+        for repoName, repo in repos.items():
+            self._register_cloned_source(repoName, repo)
+        if repos:
+            self.commit(f"cloned {len(repos)} sources")
+
+        if failures:
+            raise RuntimeError(
+                "Cloning failed for {} of {} sources:\n".format(
+                    len(failures), len(repoNames)
+                )
+                + "\n".join(
+                    f"  {repoName}: {error}" for repoName, error in sorted(failures.items())
+                )
+            )
+        return repos
+
+    def _clone_source(self, repoName, repoPath, verbose=True, **clone_kwargs):
+        """
+        Private
+        Clone a source via ssh and fall back to https
+        """
+        if config.SHARED_OBJECT_STORE:
+            clone_kwargs = dict(self.objectStore.clone_kwargs(), **clone_kwargs)
+        with self.instrumentation.span("clone", repoName):
+            return self._clone_source_via_ssh_or_https(
+                repoName, repoPath, verbose, **clone_kwargs
+            )
+
+    def _clone_source_via_ssh_or_https(self, repoName, repoPath, verbose, **clone_kwargs):
+        progress = progress_printer() if verbose else None
         try:
-            print("Try cloning source via ssh...", end='')
+            if verbose:
+                print("Try cloning source via ssh...", end='')
             url = config.DATASHELF_REMOTE + repoName + ".git"
             repo = git.Repo.clone_from(
-                url=url, to_path=repoPath, progress=TqdmProgressPrinter()
+                url=url, to_path=repoPath, progress=progress, **clone_kwargs
             )
         except:
-            print('failed.')
+            if verbose:
+                print('failed.')
             try:
                 
-                print("Try Cloning source via https...", end='')
+                if verbose:
+                    print("Try Cloning source via https...", end='')
                 url = config.DATASHELF_REMOTE_HTTPS + repoName + ".git"
                 repo = git.Repo.clone_from(
-                    url=url, to_path=repoPath, progress=TqdmProgressPrinter()
+                    url=url, to_path=repoPath, progress=progress, **clone_kwargs
                 )
             except Exception:
-                print('failed.')
+                if verbose:
+                    print('failed.')
                 if config.DEBUG:
                     print(traceback.format_exc())
                     print("Failed to import source {}".format(repoName))
@@ -428,19 +911,59 @@ class GitRepository_Manager:
                     1) Does "{repoName}" exists in {config.DATASHELF_REMOTE_HTTPS}
                     2) Check your ssh connection with: dt.test_ssh_remote_connection())
                     """))
+        return repo
+
+    def _register_cloned_source(self, repoName, repo):
+        """
+        Private
+        Add a cloned source to the repositories and sources.csv
+        """
         self.repositories[repoName] = repo
 
         # Update source file
-        sourceMetaDict = csv_to_dict(os.path.join(repoPath, "meta.csv"))
+        sourceMetaDict = csv_to_dict(os.path.join(repo.working_dir, "meta.csv"))
         sourceMetaDict["git_commit_hash"] = repo.commit().hexsha
-        tag = self.get_tag_of_source(repoName)
+        tag = self._get_tag_of_head(repo)
         sourceMetaDict["tag"] = tag
-        self.sources.loc[repoName] = pd.Series(sourceMetaDict)
-        self.sources.to_csv(config.SOURCE_FILE)
-        self.gitAddFile("main", config.SOURCE_FILE)
+        self.registry.upsert(repoName, sourceMetaDict, replace=True)
+        self.gitAddFile("main", self.cfg['SOURCE_FILE'])
 
-        return repo
-    
+        if config.SHARED_OBJECT_STORE:
+            self._share_source_objects(repoName)
+
+    def validate_all_sources(self, workers=None, use_processes=False, raise_on_error=False):
+        """
+        Validate all sources in the database in parallel and collect all
+        inconsistencies in a single report.
+
+        Parameters
+        ----------
+        workers : int, optional
+            Number of workers. The default is config.VALIDATION_WORKERS.
+        use_processes : bool, optional
+            Use a process pool instead of threads. The default is False.
+        raise_on_error : bool, optional
+            Raise a RuntimeError listing all inconsistencies. The default is False.
+
+        Returns
+        -------
+        report : ValidationReport
+
+        """
+        with self.instrumentation.span("validate_all_sources"):
+            report = validate_sources(
+                self.cfg['PATH_TO_DATASHELF'],
+                self.sources,
+                workers=workers,
+                use_processes=use_processes,
+                cache=self.validation_cache,
+            )
+        self.validatedRepos.update(
+            sourceID for sourceID in report.clean_sources if sourceID in self.registry
+        )
+        if raise_on_error:
+            report.raise_if_invalid()
+        return report
 
     def get_source_repo_failsave(self, sourceID):
         """
@@ -454,6 +977,39 @@ class GitRepository_Manager:
         repo = self[repoName]
         return os.path.join(repo.working_dir, "source_inventory.csv")
 
+    def get_inventory_engine(self, update=True):
+        """
+        Return the consolidated inventory of all sources.
+
+        Parameters
+        ----------
+        update : bool, optional
+            Rebuild the partitions of sources whose commit hash changed.
+            The default is True.
+
+        Returns
+        -------
+        inventoryEngine : InventoryEngine
+
+        """
+        if self.inventoryEngine is None:
+            self.inventoryEngine = InventoryEngine(
+                self.cfg['PATH_TO_DATASHELF'], read_only=self.read_only
+            )
+        if update:
+            # a snapshot reads the inventories at the pinned commits and
+            # never writes the shared cache
+            readInventory = self._snapshot_inventory if self.read_only else None
+            with self.instrumentation.span("inventory_update"):
+                self.inventoryEngine.update(self.sources, readInventory)
+        return self.inventoryEngine
+
+    def _snapshot_inventory(self, sourceID, hexsha):
+        try:
+            return self.inventory_at(sourceID, hexsha)
+        except FileNotFoundError:
+            return None
+
     def init_new_repo(self, repoPath, repoID, sourceMetaDict):
         """
         Method to create a new repository for a source
@@ -464,9 +1020,9 @@ class GitRepository_Manager:
         repoID   : str
         sourceMetaDict : dict with the required meta data descriptors
         """
-        self.sources.loc[repoID] = pd.Series(sourceMetaDict)
-        self.sources.to_csv(config.SOURCE_FILE)
-        self.gitAddFile("main", config.SOURCE_FILE)
+        self._check_writable()
+        self.registry.upsert(repoID, sourceMetaDict, replace=True)
+        self.gitAddFile("main", self.cfg['SOURCE_FILE'])
 
         repoPath = Path(repoPath)
         print(f"creating folder {repoPath}")
@@ -495,6 +1051,7 @@ class GitRepository_Manager:
         repoName : str
         filePath : str of the relative file path
         """
+        self._check_writable()
         if config.DEBUG:
             print("Added file {} to repo: {}".format(filePath, repoName))
 
@@ -510,6 +1067,7 @@ class GitRepository_Manager:
         repoName : str
         filePath : str of the relative file path
         """
+        self._check_writable()
         self[repoName].index.remove(filePaths, working_tree=True)
         self.updatedRepos.add(repoName)
 
@@ -522,6 +1080,7 @@ class GitRepository_Manager:
         repoName : str
         filePath : str of the relative file path
         """
+        self._check_writable()
         if config.DEBUG:
             print("Removed file {} to repo: {}".format(filePath, repoName))
         self[repoName].git.execute(
@@ -538,29 +1097,209 @@ class GitRepository_Manager:
         ----
         message : str - commit message
         """
+        self._check_writable()
         if "main" in self.updatedRepos:
             self.updatedRepos.remove("main")
 
-        for repoID in self.updatedRepos:
-            repo = self.repositories[repoID]
-            repo.index.add(self.filesToAdd[repoID])
-            commit = repo.index.commit(message + " by " + config.CRUNCHER)
-            self.sources.loc[repoID, "git_commit_hash"] = commit.hexsha
-            tag = self.get_tag_of_source(repoID)
-            self.sources.loc[repoID, "tag"] = tag
+        full_message = message + " by " + config.CRUNCHER
+        repoIDs = sorted(self.updatedRepos)
+
+        # the source locks are held until sources.csv records the new hashes
+        with self.instrumentation.span("lock_sources"):
+            source_locks = self.locks.lock_all(repoIDs)
+        with source_locks:
+            self._commit_sources(repoIDs, full_message)
+
+            # short critical section of all writers of the datashelf
+            main_lock = self.locks.lock("main")
+            with self.instrumentation.span("lock_main"):
+                main_lock.acquire()
+            try:
+                self._commit_main(full_message)
+            finally:
+                main_lock.release()
+
+        # reset updated repos to empty
+        self.updatedRepos = set()
+
+    def _commit_sources(self, repoIDs, full_message):
+        """
+        Private
+        Commit the source repositories in parallel and record the new hashes
+        in the registry. All source commits are undone if any commit fails.
+        """
+        results = dict()
+        failures = dict()
+        with ThreadPoolExecutor(max_workers=config.COMMIT_WORKERS) as executor:
+            futures = {
+                repoID: executor.submit(
+                    self._commit_source,
+                    self.repositories[repoID],
+                    self.filesToAdd[repoID],
+                    full_message,
+                )
+                for repoID in repoIDs
+            }
+            for repoID, future in futures.items():
+                try:
+                    results[repoID] = future.result()
+                except Exception as e:
+                    failures[repoID] = e
+
+        if failures:
+            # undo the successful source commits, so that no partial state
+            # is recorded and the commit can be repeated
+            for repoID, (previous_hexsha, hexsha, tag) in results.items():
+                self._undo_commit(self.repositories[repoID], previous_hexsha)
+            raise RuntimeError(
+                "Commit failed for {} of {} sources, no changes were committed:\n".format(
+                    len(failures), len(repoIDs)
+                )
+                + "\n".join(
+                    f"  {repoID}: {error!r}" for repoID, error in sorted(failures.items())
+                )
+            )
+
+        for repoID, (previous_hexsha, hexsha, tag) in results.items():
+            self.registry.upsert(repoID, {"git_commit_hash": hexsha, "tag": tag})
             del self.filesToAdd[repoID]
 
-        # commit main repository
-        self.sources.to_csv(config.SOURCE_FILE)
-        self.gitAddFile("main", config.SOURCE_FILE)
+    def _commit_main(self, full_message):
+        """
+        Private
+        Write sources.csv, including the changes of other processes, and
+        commit the main repository.
+        """
+        with self.instrumentation.span("read_sources_csv"):
+            self.registry.refresh()
+        with self.instrumentation.span("write_sources_csv"):
+            self.registry.flush()
+        self.gitAddFile("main", self.cfg['SOURCE_FILE'])
 
         main_repo = self["main"]
-        main_repo.index.add(self.filesToAdd["main"])
-        main_repo.index.commit(message + " by " + config.CRUNCHER)
+        with self.instrumentation.span("index_add", "main"):
+            stage_files(main_repo, self.filesToAdd["main"])
+        with self.instrumentation.span("index_commit", "main"):
+            main_repo.index.commit(full_message)
         del self.filesToAdd["main"]
 
-        # reset updated repos to empty
-        self.updatedRepos = set()
+    def run_maintenance(self, repoNames=None, tasks=None, workers=None, force=False):
+        """
+        Maintain the object databases of the repositories that exceed the
+        object/pack thresholds or were not maintained within
+        config.MAINTENANCE_INTERVAL.
+
+        Parameters
+        ----------
+        repoNames : list of str, optional
+            The default is all sources and "main".
+        tasks : list of str, optional
+            Maintenance tasks, see maintenance.TASKS. The default is
+            config.MAINTENANCE_TASKS.
+        workers : int, optional
+            The default is config.MAINTENANCE_WORKERS.
+        force : bool, optional
+            Maintain all repositories. The default is False.
+
+        Returns
+        -------
+        report : pandas.DataFrame
+            Object counts and sizes before and after and the seconds per task
+            of each maintained repository.
+        """
+        self._check_writable()
+        if repoNames is None:
+            repoNames = list(self.registry) + ["main"]
+        scheduler = MaintenanceScheduler(self.cfg['PATH_TO_DATASHELF'], locks=self.locks)
+        with self.instrumentation.span("maintenance"):
+            report = scheduler.run(repoNames, tasks=tasks, workers=workers, force=force)
+        # release the cat-file processes holding the replaced packs
+        self.objectPool.close()
+        return report
+
+    def _share_source_objects(self, repoName):
+        """
+        Private
+        Move the objects of a source into the shared object store
+        """
+        with self.locks.lock_all([repoName, "objects"]):
+            with self.instrumentation.span("share_objects", repoName):
+                stats = self.objectStore.add_source(
+                    repoName, os.path.dirname(self._get_git_dir(repoName))
+                )
+        # the running cat-file processes do not see the new alternates and
+        # hold the replaced packs
+        repo = self.repositories.get(repoName)
+        if repo is not None:
+            repo.git.clear_cache()
+        self.objectPool.close()
+        return stats
+
+    def share_objects(self, repoNames=None):
+        """
+        Move the objects of sources into the shared object store of the
+        datashelf, so objects common to several sources are stored once.
+        Sources borrow the objects of the store via git alternates. Sharing
+        again after pulls moves the newly fetched objects into the store.
+
+        Parameters
+        ----------
+        repoNames : list of str, optional
+            The default is all sources.
+
+        Returns
+        -------
+        report : pandas.DataFrame
+            Disk usage of the sources, see report_disk_usage.
+        """
+        self._check_writable()
+        if repoNames is None:
+            repoNames = list(self.registry)
+        for repoName in repoNames:
+            self._share_source_objects(repoName)
+        with self.locks.lock("objects"):
+            self.objectStore.repack()
+        return self.report_disk_usage(repoNames, verbose=False)
+
+    def report_disk_usage(self, repoNames=None, verbose=True):
+        """
+        Report the disk usage of sources and the bytes saved by the shared
+        object store.
+
+        Parameters
+        ----------
+        repoNames : list of str, optional
+            The default is all sources.
+        verbose : bool, optional
+            Print the savings. The default is True.
+
+        Returns
+        -------
+        report : pandas.DataFrame
+            Indexed by SOURCE_ID with the columns shared, local_size,
+            reachable_size and borrowed_size in bytes.
+        """
+        if repoNames is None:
+            repoNames = list(self.registry)
+        objectStore = self.objectStore or SharedObjectStore(self.cfg['PATH_TO_DATASHELF'])
+        report = objectStore.disk_usage(
+            {
+                repoName: os.path.dirname(self._get_git_dir(repoName))
+                for repoName in repoNames
+            }
+        )
+        if verbose:
+            savings = objectStore.savings(report)
+            print(
+                "Sources use {:.1f} MB with the shared object store ({:.1f} MB) "
+                "instead of {:.1f} MB, saving {:.1f} MB".format(
+                    savings["with_store"] / 2**20,
+                    savings["store_size"] / 2**20,
+                    savings["without_store"] / 2**20,
+                    savings["saved"] / 2**20,
+                )
+            )
+        return report
 
     def create_remote_repo(self, repoName):
         """
@@ -578,28 +1317,23 @@ class GitRepository_Manager:
             )
 
         branch = repo.active_branch
-        origin.push(branch, progress=TqdmProgressPrinter())
+        origin.push(branch, progress=progress_printer())
 
         # Update references on remote
         origin.fetch()
         branch.set_tracking_branch(origin.refs[0])
 
     def get_hash_of_source(self, repoName):
+        if self.read_only:
+            return self.registry.get(repoName, "git_commit_hash")
         repo = self[repoName]
         return repo.head.commit.hexsha
 
     def get_tag_of_source(self, repoName):
-        repo = self.get_source_repo_failsave(repoName)
-        if len(repo.tags) == 0:
-            return None
-
-        # tag of head
-        return next(
-            (tag.name for tag in repo.tags if tag.commit == repo.head.commit), None
-        )
-        # latest tag
-        tags = sorted(repo.tags, key=lambda t: t.commit.committed_datetime)
-        return tags[-1].name
+        git_dir = self._get_git_dir(repoName)
+        if self.read_only:
+            return self._get_tag_index(git_dir).tag_at(self.get_hash_of_source(repoName))
+        return self._get_tag_index(git_dir).tag_at(read_head(git_dir))
 
     def checkout_git_version(self, repoName, tag):
 
@@ -616,6 +1350,298 @@ class GitRepository_Manager:
         repo.git.checkout(tag)
         return repo.commit().hexsha
 
+    def resolve_version(self, repoName, version="latest"):
+        """
+        Return the commit sha of a version of a source.
+
+        Parameters
+        ----------
+        repoName : str
+        version : str, optional
+            "latest" for the commit recorded in sources.csv, a tag or a
+            commit sha. The default is "latest".
+
+        Returns
+        -------
+        hexsha : str
+
+        """
+        if version == "latest":
+            return self.registry.get(repoName, "git_commit_hash")
+
+        git_dir = self._get_git_dir(repoName)
+        tagIndex = self._get_tag_index(git_dir)
+        if version in tagIndex.tags:
+            return tagIndex.tags[version][0]
+        info = self.objectPool.get(git_dir).info(version + "^{commit}")
+        if info is None:
+            raise KeyError(f"Version {version} does not exist in source {repoName}")
+        return info[0]
+
+    def read_file(self, repoName, filePath, version="latest"):
+        """
+        Read the content of a file of a source at any version directly from the
+        git object database without touching the working tree.
+
+        Parameters
+        ----------
+        repoName : str
+        filePath : str
+            Path relative to the source repository or inside its working tree.
+        version : str, optional
+            "latest", a tag or a commit sha. The default is "latest".
+
+        Returns
+        -------
+        content : bytes
+
+        """
+        git_dir = self._get_git_dir(repoName)
+        if os.path.isabs(filePath):
+            filePath = os.path.relpath(filePath, os.path.dirname(git_dir))
+        filePath = Path(filePath).as_posix()
+
+        hexsha = self.resolve_version(repoName, version)
+        with self.instrumentation.span("read_blob", repoName):
+            result = self.objectPool.get(git_dir).read(f"{hexsha}:{filePath}")
+        if result is None or result[1] != "blob":
+            raise FileNotFoundError(
+                f"{filePath} does not exist in source {repoName} at version {version}"
+            )
+        return result[2]
+
+    def read_table(self, repoName, filePath, version="latest", **kwargs):
+        """
+        Read a table of a source at any version into a DataFrame without
+        checking out the version. The reader is chosen by the file extension
+        (.csv, .xlsx/.xls or .parquet) and kwargs are passed to it. Folders
+        written by write_table are read as chunked table, supporting the
+        kwargs columns and filters.
+        """
+        if Path(filePath).suffix == "":
+            hexsha = self.resolve_version(repoName, version)
+            try:
+                return read_chunked_table(
+                    lambda fileName: self.read_file(
+                        repoName, os.path.join(filePath, fileName), hexsha
+                    ),
+                    **kwargs,
+                )
+            except FileNotFoundError:
+                pass
+
+        stream = io.BytesIO(self.read_file(repoName, filePath, version))
+        suffix = Path(filePath).suffix.lower()
+        if suffix in (".xlsx", ".xls"):
+            return pd.read_excel(stream, **kwargs)
+        elif suffix == ".parquet":
+            return pd.read_parquet(stream, **kwargs)
+        return pd.read_csv(stream, **kwargs)
+
+    def inventory_at(self, repoName, version="latest"):
+        """
+        Return the inventory of a source at a version from the version cache.
+        On a miss, source_inventory.csv of the version is read from the git
+        object database. The returned DataFrame must be treated as read-only.
+
+        Parameters
+        ----------
+        repoName : str
+        version : str, optional
+            "latest", a tag or a commit sha. The default is "latest".
+
+        Returns
+        -------
+        inventory : pandas.DataFrame
+        """
+        hexsha = self.resolve_version(repoName, version)
+        return self.versionCache.get_or_load(
+            (repoName, hexsha, "source_inventory.csv", ""),
+            lambda: read_source_inventory(
+                io.BytesIO(self.read_file(repoName, "source_inventory.csv", hexsha))
+            ),
+        )
+
+    def table_at(self, repoName, filePath, version="latest", **kwargs):
+        """
+        Return a table of a source at a version from the version cache. On a
+        miss, the table is read by read_table with the given kwargs. The
+        returned DataFrame must be treated as read-only.
+        """
+        hexsha = self.resolve_version(repoName, version)
+        key = (repoName, hexsha, Path(filePath).as_posix(), repr(sorted(kwargs.items())))
+        return self.versionCache.get_or_load(
+            key, lambda: self.read_table(repoName, filePath, hexsha, **kwargs)
+        )
+
+    def history(self, repoName, version="latest", max_count=None, paths=None, since=None):
+        """
+        Return the commit history of a source up to a version, newest first.
+
+        Parameters
+        ----------
+        repoName : str
+        version : str, optional
+            "latest", a tag or a commit sha. The default is "latest".
+        max_count : int, optional
+            Maximal number of commits. The default is all commits.
+        paths : list of str, optional
+            Only commits changing these paths. The default is None.
+        since : str, optional
+            Only commits after this tag or commit sha ("git log since..version").
+            The default is None.
+
+        Returns
+        -------
+        history : pandas.DataFrame
+            Indexed by the commit sha with the columns parents, date, author,
+            message and tags.
+        """
+        git_dir = self._get_git_dir(repoName)
+        hexsha = self.resolve_version(repoName, version)
+        if since is not None:
+            since = self.resolve_version(repoName, since)
+        with self.instrumentation.span("git_log", repoName):
+            history = commit_history(
+                git_dir, hexsha, max_count=max_count, paths=paths, since=since
+            )
+        by_commit = self._get_tag_index(git_dir).by_commit
+        history["tags"] = [list(by_commit.get(sha, [])) for sha in history.index]
+        return history
+
+    def changed_since(self, repoName, old_version, new_version="latest"):
+        """
+        Return the commits with their tags and the paths of a source changed
+        between two versions.
+
+        Parameters
+        ----------
+        repoName : str
+        old_version : str
+            A tag or a commit sha.
+        new_version : str, optional
+            "latest", a tag or a commit sha. The default is "latest".
+
+        Returns
+        -------
+        commits : pandas.DataFrame
+            History of the commits after old_version up to new_version, see
+            history.
+        changes : pandas.DataFrame
+            Columns status ("added", "deleted", "modified" or "type changed")
+            and path relative to the source repository.
+        """
+        git_dir = self._get_git_dir(repoName)
+        old = self.resolve_version(repoName, old_version)
+        new = self.resolve_version(repoName, new_version)
+        commits = self.history(repoName, new, since=old)
+        with self.instrumentation.span("diff_tree", repoName):
+            changes = changed_paths(git_dir, old, new)
+        return commits, changes
+
+    def changed_sources(self, old_commit, new_commit="HEAD", paths=True):
+        """
+        Compare sources.csv of two commits of the main repository and return
+        the sources with a different git_commit_hash and their changed paths.
+
+        Parameters
+        ----------
+        old_commit : str
+            Commit (or tag) of the main repository.
+        new_commit : str, optional
+            The default is "HEAD".
+        paths : bool, optional
+            Include the changed paths of the sources. The default is True.
+
+        Returns
+        -------
+        changes : pandas.DataFrame
+            Columns SOURCE_ID, change ("added", "removed" or "modified"),
+            old_hash, new_hash and, if paths is True, status and path with one
+            row per changed path. Removed sources have no paths.
+        """
+        _, old_registry = self._read_registry_at(old_commit)
+        _, new_registry = self._read_registry_at(new_commit)
+
+        rows = list()
+        for sourceID in sorted(set(old_registry.rows).union(new_registry.rows)):
+            old_hash = old_registry.rows.get(sourceID, {}).get("git_commit_hash")
+            new_hash = new_registry.rows.get(sourceID, {}).get("git_commit_hash")
+            if old_hash == new_hash:
+                continue
+            if old_hash is None:
+                change = "added"
+            elif new_hash is None:
+                change = "removed"
+            else:
+                change = "modified"
+            row = dict(SOURCE_ID=sourceID, change=change, old_hash=old_hash, new_hash=new_hash)
+            if not paths or new_hash is None:
+                rows.append(row)
+                continue
+            with self.instrumentation.span("diff_tree", sourceID):
+                diff = changed_paths(self._get_git_dir(sourceID), old_hash, new_hash)
+            rows.extend(
+                dict(row, status=status, path=path)
+                for status, path in zip(diff["status"], diff["path"])
+            )
+
+        columns = ["SOURCE_ID", "change", "old_hash", "new_hash"]
+        if paths:
+            columns += ["status", "path"]
+        return pd.DataFrame(rows, columns=columns)
+
+    def write_table(self, repoName, filePath, table, chunk_by=None, row_group_size=None):
+        """
+        Write a table as folder of Parquet chunks into a source and add the
+        modified chunks for the next commit. Unchanged chunks are not
+        rewritten, so commits only grow by the modified chunks.
+
+        Parameters
+        ----------
+        repoName : str
+        filePath : str
+            Folder of the table relative to the source repository.
+        table : pandas.DataFrame
+        chunk_by : list of str, optional
+            Columns defining the chunks, e.g. ["region"]. The default is None.
+        row_group_size : int, optional
+            Maximal number of rows per Parquet row group.
+
+        Returns
+        -------
+        written : list
+            Paths of the written chunk files.
+        """
+        self._check_writable()
+        repo = self[repoName]
+        folder = os.path.join(repo.working_tree_dir, filePath)
+        written, removed = write_chunked_table(
+            table, folder, chunk_by=chunk_by, row_group_size=row_group_size
+        )
+        for path in written:
+            self.gitAddFile(repoName, path)
+        if removed:
+            # chunks of a committed version are removed from the index by the
+            # next commit, chunks that were never committed are dropped
+            entries = repo.index.entries
+            removed = [os.path.abspath(path) for path in removed]
+            self.filesToAdd[repoName] = [
+                path
+                for path in self.filesToAdd[repoName]
+                if os.path.abspath(os.path.join(repo.working_tree_dir, path)) not in removed
+            ]
+            for path in removed:
+                relPath = Path(os.path.relpath(path, repo.working_tree_dir)).as_posix()
+                if (relPath, 0) in entries:
+                    self.gitAddFile(repoName, path)
+        return written
+
+    def _get_git_dir(self, repoName):
+        return os.path.join(
+            self.cfg['PATH_TO_DATASHELF'], "database", repoName, ".git"
+        )
+
     def push_to_remote_datashelf(self, repoName, force=True):
         """
         This function used git push to update the remote database with an updated
@@ -640,11 +1666,93 @@ class GitRepository_Manager:
         self._update_remote_sources(repoName)
         self._update_local_sources_tag(repoName)
 
-        remote_repo.remotes.origin.push(progress=TqdmProgressPrinter())
+        with self.instrumentation.span("push", "remote_sources"):
+            remote_repo.remotes.origin.push(progress=progress_printer())
+
+        with self.instrumentation.span("push", repoName):
+            self[repoName].remotes.origin.push(progress=progress_printer())
+
+        with self.instrumentation.span("push_tags", repoName):
+            self[repoName].remotes.origin.push(progress=progress_printer(), tags=True)
+
+    async def push_many(self, repoNames, max_concurrency=None):
+        """
+        Push multiple sources to the remote datashelf concurrently.
+
+        The remote sources are pulled once, the tags and the remote source
+        states of all sources are updated in a single commit and the sources
+        are pushed with at most max_concurrency parallel git processes. The
+        remote source states are only pushed if all sources were pushed
+        successfully.
+
+        Parameters
+        ----------
+        repoNames : list of str
+        max_concurrency : int, optional
+            The default is config.REMOTE_CONCURRENCY.
+
+        """
+        self._check_writable()
+        remote_repo = self._pull_remote_sources()
+
+        updated = self._update_remote_source_states(repoNames)
+        if updated:
+            for repoName in updated:
+                self.registry.upsert(repoName, {"tag": self.get_tag_of_source(repoName)})
+            self.commit("Update tags of sources")
+
+        commands = {
+            repoName: (
+                self[repoName].working_dir,
+                ["push", "origin", self[repoName].active_branch.name, "--tags"],
+            )
+            for repoName in repoNames
+        }
+        results = await run_git_commands(
+            commands, max_concurrency, self.instrumentation.span, "push"
+        )
+        raise_git_failures(results, "Push")
+
+        with self.instrumentation.span("push", "remote_sources"):
+            await run_git(remote_repo.working_dir, ["push", "origin"])
+
+    async def pull_many(self, repoNames, max_concurrency=None):
+        """
+        Pull updates of multiple sources from the remote datashelf concurrently.
+
+        The remote sources are pulled once and the sources are pulled with at
+        most max_concurrency parallel git processes. Hashes, tags and inventory
+        partitions are updated afterwards.
+
+        Parameters
+        ----------
+        repoNames : list of str
+        max_concurrency : int, optional
+            The default is config.REMOTE_CONCURRENCY.
 
-        self[repoName].remotes.origin.push(progress=TqdmProgressPrinter())
+        Returns
+        -------
+        inventory : pandas.DataFrame
+            Consolidated inventory of all sources.
+
+        """
+        self._check_writable()
+        self._pull_remote_sources()
+        commands = {
+            repoName: (self[repoName].working_dir, ["pull", "origin"])
+            for repoName in repoNames
+        }
+        results = await run_git_commands(
+            commands, max_concurrency, self.instrumentation.span, "pull"
+        )
+        for repoName in repoNames:
+            if not isinstance(results[repoName], Exception):
+                self._apply_source_update(repoName, persist=False)
+        # keep the partitions of the successful pulls if others failed
+        self.get_inventory_engine(update=False).save()
+        raise_git_failures(results, "Pull")
 
-        self[repoName].remotes.origin.push(progress=TqdmProgressPrinter(), tags=True)
+        return self._consolidated_inventory()
 
     def test_ssh_remote_connection(self):
         """
@@ -666,39 +1774,113 @@ class GitRepository_Manager:
             print(f'Connection failed with exit code {retcode}')
     
 
-    def pull_update_from_remote(self, repoName, old_inventory):
+    def pull_update_from_remote(self, repoName, old_inventory=None):
         """
         This function used git pull an updated remote source dataset to the local
         database.
 
-        Input is the source ID as a str.
+        Input is the source ID as a str. The inventory partition of the source
+        is swapped in the inventory engine and the inventory is returned as
+        DataFrame: old_inventory with the rows of the source replaced if
+        given, otherwise the consolidated inventory of all sources.
 
         Currently conflicts beyond auto-conflict management are not caught by this
         function. TODO
 
         """
-        remote_repo = self._pull_remote_sources()
+        self._check_writable()
+        self._pull_remote_sources()
+        sourceInventory = self._pull_source_update(repoName)
+
+        if old_inventory is not None:
+            return pd.concat(
+                [old_inventory[old_inventory["source"] != repoName], sourceInventory]
+            )
+        return self._consolidated_inventory()
+
+    def pull_updates_from_remote(self, repoNames):
+        """
+        Pull updates of multiple sources. The remote sources are pulled only
+        once and the merged inventory is materialized once after all sources
+        are updated.
+
+        Parameters
+        ----------
+        repoNames : list of str
+
+        Returns
+        -------
+        inventory : pandas.DataFrame
+            Consolidated inventory of all sources.
 
-        self[repoName].remote("origin").pull(progress=TqdmProgressPrinter())
+        """
+        self._check_writable()
+        self._pull_remote_sources()
+        for repoName in repoNames:
+            self._pull_source_update(repoName, persist=False)
+        return self._consolidated_inventory()
+
+    def _consolidated_inventory(self):
+        """
+        Private
+        Return the consolidated inventory of all sources after partitions were
+        swapped. The engine is synchronized with sources.csv, so a cold engine
+        also contains the sources that were not pulled, and the swapped
+        partitions and the manifest are written once.
+        """
+        return self.get_inventory_engine(update=True).table
+
+    def _pull_source_update(self, repoName, persist=True):
+        """
+        Private
+        Pull one source and apply the update
+        """
+        with self.instrumentation.span("pull", repoName):
+            self[repoName].remote("origin").pull(progress=progress_printer())
+        return self._apply_source_update(repoName, persist=persist)
+
+    def _apply_source_update(self, repoName, persist=True):
+        """
+        Private
+        Update hash, tag and inventory partition of a pulled source. With
+        persist=False the partition is written by the next save of the
+        inventory engine.
+        """
         self.updateGitHash_and_Tag(repoName)
         repoPath = os.path.join( self.cfg['PATH_TO_DATASHELF'], "database", repoName)
+        inventoryPath = os.path.join(repoPath, "source_inventory.csv")
+        if not os.path.exists(inventoryPath):
+            # source without inventory
+            self.get_inventory_engine(update=False).remove_partition(
+                repoName, persist=persist
+            )
+            return None
+
         sourceInventory = pd.read_csv(
-            os.path.join(repoPath, "source_inventory.csv"),
+            inventoryPath,
             index_col=0,
             dtype={"source_year": str},
         )
-        new_inventory = pd.concat(
-            [old_inventory[old_inventory["source"] != repoName], sourceInventory]
+        self.get_inventory_engine(update=False).set_partition(
+            repoName,
+            sourceInventory,
+            hexsha=self.registry.get(repoName, "git_commit_hash"),
+            persist=persist,
         )
-
-        return new_inventory
+        return sourceInventory
 
     def verifyGitHash(self, repoName):
         """
         Function to verify the git hash code of an existing git repository
         """
         repo = self.repositories[repoName]
-        if repo.commit().hexsha != self.sources.loc[repoName, "git_commit_hash"]:
+        with self.instrumentation.span("verify_hash", repoName):
+            hexsha = repo.commit().hexsha
+        if hexsha != self.registry.get(repoName, "git_commit_hash") and not (
+            # the source may have been committed by another process
+            self.registry.refresh()
+            and hexsha == self.registry.get(repoName, "git_commit_hash")
+        ):
             raise RuntimeError(
                 "Source {} is inconsistent with overall database".format(repoName)
             )
@@ -707,9 +1889,10 @@ class GitRepository_Manager:
         """
         Function to update the git hash code in the sources.csv by the repo hash code
         """
-        self.sources.loc[repoName, "git_commit_hash"] = self[repoName].commit().hexsha
+        self._check_writable()
+        hexsha = self[repoName].commit().hexsha
         tag = self.get_tag_of_source(repoName)
-        self.sources.loc[repoName, "tag"] = tag
+        self.registry.upsert(repoName, {"git_commit_hash": hexsha, "tag": tag})
 
     def setActive(self, repoName):
         """
@@ -718,36 +1901,8 @@ class GitRepository_Manager:
         self[repoName].git.refresh()
 
     def isSource(self, sourceID):
-        if sourceID in self.sources.index:
+        if sourceID in self.registry:
             self[sourceID].git.refresh()
             return True
         else:
             return False
-
-
-#%% TqdmProgressPrinter
-class TqdmProgressPrinter(git.RemoteProgress):
-    known_ops = {
-        git.RemoteProgress.COUNTING: "counting objects",
-        git.RemoteProgress.COMPRESSING: "compressing objects",
-        git.RemoteProgress.WRITING: "writing objects",
-        git.RemoteProgress.RECEIVING: "receiving objects",
-        git.RemoteProgress.RESOLVING: "resolving stuff",
-        git.RemoteProgress.FINDING_SOURCES: "finding sources",
-        git.RemoteProgress.CHECKING_OUT: "checking things out",
-    }
-
-    def __init__(self):
-        super().__init__()
-        self.progressbar = None
-
-    def update(self, op_code, cur_count, max_count=None, message=""):
-        if op_code & self.BEGIN:
-            desc = self.known_ops.get(op_code & self.OP_MASK)
-            self.progressbar = tqdm.tqdm(desc=desc, total=max_count)
-
-        self.progressbar.set_postfix_str(message, refresh=False)
-        self.progressbar.update(cur_count)
-
-        if op_code & self.END:
-            self.progressbar.close()
\ No newline at end of file
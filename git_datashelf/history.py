@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Commit history and changed paths of the source repositories
+
+The history is read with a single "git log" and changed paths with a single
+"git diff-tree" call, both of which use the commit-graph of a repository if
+it was written (see maintenance).
+
+@author: andreasgeiges
+"""
+import subprocess
+
+from .lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# object name of the empty tree, used to diff the first version of a source
+EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+STATUS = {"A": "added", "D": "deleted", "M": "modified", "T": "type changed"}
+
+
+def _run_git(git_dir, args):
+    return subprocess.run(
+        ["git", "--git-dir", git_dir] + list(args),
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ).stdout.decode()
+
+
+def commit_history(git_dir, rev="HEAD", max_count=None, paths=None, since=None):
+    """
+    Return the commits reachable from rev, newest first.
+
+    Parameters
+    ----------
+    git_dir : str
+    rev : str, optional
+        The default is "HEAD".
+    max_count : int, optional
+        Maximal number of commits. The default is all commits.
+    paths : list of str, optional
+        Only commits changing these paths. The default is None.
+    since : str, optional
+        Exclude the commits reachable from since, i.e. "git log since..rev".
+        The default is None.
+
+    Returns
+    -------
+    history : pandas.DataFrame
+        Indexed by the commit sha with the columns parents, date, author and
+        message.
+    """
+    if since is not None:
+        rev = f"{since}..{rev}"
+    args = ["log", "--format=%H%x1f%P%x1f%at%x1f%an%x1f%s%x1e", rev]
+    if max_count is not None:
+        args.insert(1, f"--max-count={max_count}")
+    if paths:
+        args += ["--"] + list(paths)
+    records = list()
+    for record in _run_git(git_dir, args).split("\x1e"):
+        record = record.strip("\n")
+        if not record:
+            continue
+        hexsha, parents, timestamp, author, message = record.split("\x1f")
+        records.append((hexsha, parents.split(), int(timestamp), author, message))
+
+    history = pd.DataFrame(
+        records, columns=["hexsha", "parents", "date", "author", "message"]
+    ).set_index("hexsha")
+    history["date"] = pd.to_datetime(history["date"], unit="s", utc=True)
+    return history
+
+
+def changed_paths(git_dir, old, new):
+    """
+    Return the paths changed between two commits.
+
+    Parameters
+    ----------
+    git_dir : str
+    old : str or None
+        Commit sha, None for all paths of new.
+    new : str
+
+    Returns
+    -------
+    changes : pandas.DataFrame
+        Columns status ("added", "deleted", "modified", "type changed") and
+        path.
+    """
+    output = _run_git(
+        git_dir,
+        ["diff-tree", "-r", "-z", "--no-renames", "--name-status", old or EMPTY_TREE, new],
+    )
+    fields = output.split("\0")
+    changes = [
+        (STATUS.get(status, status), path)
+        for status, path in zip(fields[0::2], fields[1::2])
+        if status
+    ]
+    return pd.DataFrame(changes, columns=["status", "path"])
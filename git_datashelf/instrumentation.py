@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Timing instrumentation of the git and I/O operations of the manager
+
+Operations are wrapped in spans tagged with the operation name and the
+source ID. When the instrumentation is disabled, span() returns a shared
+no-op context manager, so the overhead is a single attribute check.
+
+@author: andreasgeiges
+"""
+import json
+import threading
+import time
+
+from contextlib import nullcontext
+
+from .lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("instrumentation", "operation", "sourceID", "start")
+
+    def __init__(self, instrumentation, operation, sourceID):
+        self.instrumentation = instrumentation
+        self.operation = operation
+        self.sourceID = sourceID
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.instrumentation.records.append(
+            (
+                self.operation,
+                self.sourceID,
+                time.perf_counter() - self.start,
+                exc_type is None,
+                threading.get_ident(),
+            )
+        )
+        return False
+
+
+class Instrumentation:
+    """
+    Collects timed spans and aggregates them into per-operation statistics.
+    """
+
+    COLUMNS = ["operation", "source", "seconds", "success", "thread"]
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.records = list()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.records = list()
+
+    def span(self, operation, sourceID=None):
+        """
+        Context manager timing one operation, e.g.
+
+            with self.instrumentation.span("is_dirty", sourceID):
+                repo.is_dirty()
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, operation, sourceID)
+
+    def to_dataframe(self):
+        """
+        Return all recorded spans as DataFrame.
+        """
+        return pd.DataFrame(list(self.records), columns=self.COLUMNS)
+
+    def stats(self, by_source=False):
+        """
+        Aggregate the spans into count, total, mean, p95 and max seconds per
+        operation (and per source if by_source is True).
+        """
+        df = self.to_dataframe()
+        keys = ["operation", "source"] if by_source else ["operation"]
+        if by_source:
+            df["source"] = df["source"].fillna("")
+        grouped = df.groupby(keys)["seconds"]
+        stats = pd.DataFrame(
+            {
+                "count": grouped.count(),
+                "total": grouped.sum(),
+                "mean": grouped.mean(),
+                "p95": grouped.quantile(0.95),
+                "max": grouped.max(),
+            }
+        )
+        return stats.sort_values("total", ascending=False)
+
+    def dump(self, by_source=False):
+        """
+        Print the statistics as table.
+        """
+        import tabulate
+
+        print(
+            tabulate.tabulate(
+                self.stats(by_source=by_source), headers="keys", tablefmt="psql"
+            )
+        )
+
+    def export(self, filePath, by_source=False):
+        """
+        Export the statistics to a .csv or .json file.
+        """
+        stats = self.stats(by_source=by_source)
+        if filePath.endswith(".json"):
+            with open(filePath, "w") as f:
+                json.dump(stats.reset_index().to_dict(orient="records"), f, indent=2)
+        else:
+            stats.to_csv(filePath)
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Consolidated inventory over the source_inventory.csv files of all sources
+
+The inventory is kept as one partition per source, cached as Parquet file
+keyed by the git commit hash of the source. Only partitions of sources whose
+hash changed are rebuilt. The inventory fields are stored as categoricals and
+lookups on the indexed fields use precomputed row positions.
+
+Parquet caching requires the optional dependency pyarrow. Without it, the
+partitions are only kept in memory.
+
+@author: andreasgeiges
+"""
+import os
+import json
+import importlib.util
+
+from . import config
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+HAS_PARQUET = any(
+    importlib.util.find_spec(engine) is not None for engine in ["pyarrow", "fastparquet"]
+)
+
+
+def read_source_inventory(filePath):
+    """
+    Read a source_inventory.csv file with categorical inventory fields.
+    """
+    inventory = pd.read_csv(filePath, index_col=0, dtype={"source_year": str})
+    return to_categorical(inventory)
+
+
+def as_category(series):
+    """
+    Convert a column to a categorical with string categories, so that
+    categoricals of different partitions can be combined.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype) and series.cat.categories.dtype == object:
+        return series
+    values = series.to_numpy(dtype=object)
+    mask = pd.notna(values)
+    strings = np.full(len(values), None, dtype=object)
+    strings[mask] = [str(value) for value in values[mask]]
+    codes, categories = pd.factorize(strings, use_na_sentinel=True)
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=pd.Index(categories, dtype=object)),
+        index=series.index,
+        name=series.name,
+    )
+
+
+def to_categorical(inventory):
+    """
+    Return the inventory fields of an inventory as categorical columns.
+    """
+    return pd.DataFrame(
+        {
+            field: as_category(inventory[field])
+            if field in inventory.columns
+            else as_category(pd.Series(None, index=inventory.index, dtype=object))
+            for field in config.INVENTORY_FIELDS
+        },
+        index=inventory.index,
+    )
+
+
+def concat_inventories(inventories):
+    """
+    Concatenate inventories, keeping categorical columns categorical.
+    """
+    inventories = [inventory for inventory in inventories if len(inventory) > 0]
+    if len(inventories) == 0:
+        return to_categorical(pd.DataFrame(columns=config.INVENTORY_FIELDS))
+    if len(inventories) == 1:
+        return inventories[0].copy()
+
+    columns = {
+        field: pd.api.types.union_categoricals(
+            [inventory[field] for inventory in inventories], ignore_order=True
+        )
+        for field in config.INVENTORY_FIELDS
+    }
+    index = inventories[0].index.append([inventory.index for inventory in inventories[1:]])
+    return pd.DataFrame(columns, index=index)
+
+
+class InventoryEngine:
+    """
+    Partitioned inventory of all sources of a datashelf.
+
+    Parameters
+    ----------
+    pathToDatashelf : str
+        Path to the datashelf.
+    cacheDir : str, optional
+        Folder of the Parquet partitions. The default is
+        config.INVENTORY_CACHE_DIR in the .git folder of the main repository.
+    read_only : bool, optional
+        Only read the cached partitions, rebuilt partitions are kept in
+        memory. The default is False.
+    """
+
+    def __init__(self, pathToDatashelf, cacheDir=None, read_only=False):
+        self.pathToDatashelf = pathToDatashelf
+        self.read_only = read_only
+        if cacheDir is None:
+            cacheDir = os.path.join(pathToDatashelf, ".git", config.INVENTORY_CACHE_DIR)
+        self.cacheDir = cacheDir
+        self.manifestFile = os.path.join(cacheDir, "manifest.json")
+
+        self.hashes = dict()
+        self.partitions = dict()
+        self.unsaved = set()
+        self._table = None
+        self._indices = dict()
+
+        if os.path.exists(self.manifestFile):
+            with open(self.manifestFile, "r") as f:
+                self.hashes = json.load(f)
+
+    #%% Partitions
+    def _partition_file(self, sourceID):
+        return os.path.join(self.cacheDir, sourceID + ".parquet")
+
+    def _inventory_file(self, sourceID):
+        return os.path.join(
+            self.pathToDatashelf, "database", sourceID, "source_inventory.csv"
+        )
+
+    def _save_manifest(self):
+        tmpPath = f"{self.manifestFile}.{os.getpid()}.tmp"
+        with open(tmpPath, "w") as f:
+            json.dump(self.hashes, f, indent=0, sort_keys=True)
+        os.replace(tmpPath, self.manifestFile)
+
+    def set_partition(self, sourceID, inventory, hexsha=None, persist=True):
+        """
+        Replace the inventory partition of one source. With persist=False the
+        partition is only written by the next save().
+        """
+        self.partitions[sourceID] = to_categorical(inventory)
+        self.hashes[sourceID] = hexsha
+        self.unsaved.add(sourceID)
+        if persist:
+            self.save()
+        self._invalidate()
+
+    def remove_partition(self, sourceID, persist=True):
+        self.partitions.pop(sourceID, None)
+        self.hashes.pop(sourceID, None)
+        self.unsaved.add(sourceID)
+        if persist:
+            self.save()
+        self._invalidate()
+
+    def save(self):
+        """
+        Write the modified partitions and the manifest once. Partition files
+        are replaced atomically, so the manifest never points to a partially
+        written file.
+        """
+        if not HAS_PARQUET or self.read_only:
+            # partitions are only kept in memory
+            self.unsaved.clear()
+            return
+        if not self.unsaved:
+            return
+        os.makedirs(self.cacheDir, exist_ok=True)
+        for sourceID in sorted(self.unsaved):
+            filePath = self._partition_file(sourceID)
+            if sourceID in self.partitions:
+                tmpPath = f"{filePath}.{os.getpid()}.tmp"
+                self.partitions[sourceID].to_parquet(tmpPath)
+                os.replace(tmpPath, filePath)
+            elif os.path.exists(filePath):
+                os.remove(filePath)
+        self._save_manifest()
+        self.unsaved.clear()
+
+    def load_partition(self, sourceID):
+        """
+        Load the inventory of a source from the cache or the source repository.
+        """
+        if sourceID not in self.partitions:
+            filePath = self._partition_file(sourceID)
+            if sourceID in self.hashes and os.path.exists(filePath):
+                self.partitions[sourceID] = to_categorical(pd.read_parquet(filePath))
+            else:
+                self.partitions[sourceID] = read_source_inventory(
+                    self._inventory_file(sourceID)
+                )
+        return self.partitions[sourceID]
+
+    def _read_inventory(self, sourceID, hexsha):
+        filePath = self._inventory_file(sourceID)
+        if not os.path.exists(filePath):
+            return None
+        return read_source_inventory(filePath)
+
+    def update(self, sources, readInventory=None):
+        """
+        Synchronize the partitions with the sources of the datashelf. Only
+        the partitions of sources whose commit hash changed are rebuilt.
+
+        Parameters
+        ----------
+        sources : pandas.DataFrame
+            Content of sources.csv indexed by SOURCE_ID.
+        readInventory : callable, optional
+            readInventory(sourceID, hexsha) returns the inventory of a source
+            at a commit or None if the source has no inventory. The default
+            reads source_inventory.csv from the working tree.
+
+        Returns
+        -------
+        rebuilt : list of str
+            Sources whose partitions were rebuilt.
+        """
+        if readInventory is None:
+            readInventory = self._read_inventory
+        rebuilt = list()
+        for sourceID, hexsha in sources["git_commit_hash"].items():
+            if self.hashes.get(sourceID) == hexsha and (
+                sourceID in self.partitions
+                or os.path.exists(self._partition_file(sourceID))
+            ):
+                continue
+            inventory = readInventory(sourceID, hexsha)
+            if inventory is None:
+                # source without inventory
+                if sourceID in self.hashes:
+                    self.remove_partition(sourceID, persist=False)
+                continue
+            self.set_partition(sourceID, inventory, hexsha=hexsha, persist=False)
+            rebuilt.append(sourceID)
+
+        for sourceID in set(self.hashes).difference(sources.index):
+            self.remove_partition(sourceID, persist=False)
+        self.save()
+        return rebuilt
+
+    #%% Consolidated table
+    def _invalidate(self):
+        self._table = None
+        self._indices = dict()
+
+    @property
+    def table(self):
+        """
+        Consolidated inventory of all sources.
+        """
+        if self._table is None:
+            sourceIDs = sorted(set(self.hashes).union(self.partitions))
+            self._table = concat_inventories(
+                [self.load_partition(sourceID) for sourceID in sourceIDs]
+            )
+        return self._table
+
+    def _get_index(self, field):
+        if field not in self._indices:
+            codes = self.table[field].cat.codes.to_numpy()
+            order = np.argsort(codes, kind="stable")
+            sorted_codes = codes[order]
+            categories = self.table[field].cat.categories
+            bounds = np.searchsorted(sorted_codes, np.arange(len(categories) + 1))
+            self._indices[field] = {
+                category: order[bounds[i]:bounds[i + 1]]
+                for i, category in enumerate(categories)
+            }
+        return self._indices[field]
+
+    def query(self, **filters):
+        """
+        Return all inventory entries matching the given field values, e.g.
+        query(variable="Emissions|CO2", entity="DEU"). A list of values
+        matches any of them.
+        """
+        positions = None
+        for field, values in filters.items():
+            if field not in config.INVENTORY_FIELDS:
+                raise KeyError(f"{field} is not an inventory field")
+            if isinstance(values, str) or not np.iterable(values):
+                values = [values]
+            index = self._get_index(field)
+            field_positions = np.concatenate(
+                [index.get(value, np.array([], dtype=int)) for value in values]
+                + [np.array([], dtype=int)]
+            )
+            if positions is None:
+                positions = field_positions
+            else:
+                positions = np.intersect1d(positions, field_positions)
+        if positions is None:
+            return self.table
+        return self.table.iloc[np.sort(positions)]
+
+    def sources_providing(self, **filters):
+        """
+        Return the sorted list of sources with inventory entries matching
+        the given field values.
+        """
+        return sorted(self.query(**filters)["source"].dropna().unique())
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Deferred import of heavy dependencies
+
+lazy_import returns a proxy that imports the module on first attribute access,
+so that importing git_datashelf does not load pandas, numpy or GitPython
+before they are used. The module is imported normally under a lock, so
+concurrent first accesses from worker threads are safe and sys.modules is
+not modified for other libraries.
+
+@author: andreasgeiges
+"""
+import importlib
+import importlib.util
+import sys
+import threading
+
+
+class _LazyModule:
+    """
+    Proxy of a module that is imported on first attribute access.
+    """
+
+    def __init__(self, name):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with self._lock:
+                module = self._module
+                if module is None:
+                    module = importlib.import_module(self._name)
+                    object.__setattr__(self, "_module", module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'>"
+
+
+def lazy_import(name):
+    """
+    Return the module name, importing it on first attribute access.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ImportError(f"No module named '{name}'", name=name)
+    return _LazyModule(name)
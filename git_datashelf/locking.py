@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Inter-process locks of the repositories of a datashelf
+
+Every source repository has its own lock file and the update of sources.csv
+together with the commit of the main repository is guarded by the lock
+"main". The lock files are stored in config.LOCK_DIR in the .git folder of
+the main repository and are locked with fcntl.flock. On platforms without
+fcntl the locks do nothing.
+
+@author: andreasgeiges
+"""
+import os
+import time
+
+from contextlib import ExitStack
+
+from . import config
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class FileLock:
+    """
+    Exclusive lock on a lock file, usable as context manager.
+    """
+
+    def __init__(self, lockPath, timeout=None):
+        self.lockPath = lockPath
+        self.timeout = timeout
+        self.file = None
+
+    def acquire(self):
+        if fcntl is None or self.file is not None:
+            return
+        file = open(self.lockPath, "a")
+        try:
+            if self.timeout is None:
+                fcntl.flock(file, fcntl.LOCK_EX)
+            else:
+                deadline = time.monotonic() + self.timeout
+                while True:
+                    try:
+                        fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() > deadline:
+                            raise TimeoutError(f"Could not acquire the lock {self.lockPath}")
+                        time.sleep(0.05)
+        except BaseException:
+            file.close()
+            raise
+        self.file = file
+
+    def release(self):
+        if self.file is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class DatashelfLocks:
+    """
+    Factory of the locks of one datashelf.
+    """
+
+    def __init__(self, pathToDatashelf, timeout=None):
+        self.lockDir = os.path.join(pathToDatashelf, ".git", config.LOCK_DIR)
+        self.timeout = config.LOCK_TIMEOUT if timeout is None else timeout
+
+    def lock(self, name):
+        """
+        Return the lock of a source or "main".
+        """
+        os.makedirs(self.lockDir, exist_ok=True)
+        return FileLock(os.path.join(self.lockDir, name + ".lock"), timeout=self.timeout)
+
+    def lock_all(self, names):
+        """
+        Acquire the locks of multiple sources in sorted order (to avoid
+        deadlocks between writers) and return an ExitStack releasing them.
+        """
+        stack = ExitStack()
+        try:
+            for name in sorted(set(names)):
+                stack.enter_context(self.lock(name))
+        except BaseException:
+            stack.close()
+            raise
+        return stack
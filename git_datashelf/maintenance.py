@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Maintenance of the object databases of the repositories of a datashelf
+
+For every repository the loose object and pack counts are read with
+"git count-objects -v". Repositories above the thresholds in config, or
+whose last maintenance is older than config.MAINTENANCE_INTERVAL, get the
+maintenance tasks (commit-graph, loose objects, incremental repack,
+multi-pack-index and optionally gc) in a bounded pool of workers. The time
+of the last maintenance is stored in the .git folder of the main repository.
+
+@author: andreasgeiges
+"""
+import os
+import json
+import subprocess
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config
+from .lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+TASKS = {
+    "commit-graph": [["commit-graph", "write", "--reachable", "--changed-paths"]],
+    "loose-objects": [["maintenance", "run", "--task=loose-objects"], ["prune-packed"]],
+    "incremental-repack": [["maintenance", "run", "--task=incremental-repack"]],
+    "multi-pack-index": [["multi-pack-index", "write"]],
+    "gc": [["gc", "--quiet"]],
+}
+
+
+def object_stats(repoPath):
+    """
+    Return the object statistics of a repository with sizes in bytes.
+
+    Returns
+    -------
+    stats : dict
+        loose_objects, packs, in_pack, garbage and size (total size of loose
+        objects, packs and garbage).
+    """
+    output = subprocess.run(
+        ["git", "count-objects", "-v"],
+        cwd=repoPath,
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ).stdout.decode()
+    values = dict()
+    for line in output.splitlines():
+        key, _, value = line.partition(":")
+        # skip the "alternate:" lines of repositories with alternates
+        if key != "alternate":
+            values[key.strip()] = int(value.strip())
+    return dict(
+        loose_objects=values["count"],
+        packs=values["packs"],
+        in_pack=values["in-pack"],
+        garbage=values["garbage"],
+        size=(values["size"] + values["size-pack"] + values["size-garbage"]) * 1024,
+    )
+
+
+def exceeds_thresholds(stats):
+    """
+    Check the object statistics against config.MAINTENANCE_MAX_LOOSE_OBJECTS
+    and config.MAINTENANCE_MAX_PACKS.
+    """
+    return (
+        stats["loose_objects"] > config.MAINTENANCE_MAX_LOOSE_OBJECTS
+        or stats["packs"] > config.MAINTENANCE_MAX_PACKS
+    )
+
+
+def maintain_repository(repoPath, tasks):
+    """
+    Run maintenance tasks in one repository.
+
+    Returns
+    -------
+    result : dict
+        Object statistics before and after, the seconds per task and the
+        error of the first failed task (None if all tasks succeeded).
+    """
+    before = object_stats(repoPath)
+    timings = dict()
+    error = None
+    for task in tasks:
+        start = time.perf_counter()
+        for command in TASKS[task]:
+            proc = subprocess.run(
+                ["git"] + command, cwd=repoPath, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+            if proc.returncode != 0:
+                error = f"{task}: {proc.stderr.decode().strip()}"
+                break
+        timings[task] = time.perf_counter() - start
+        if error is not None:
+            break
+    return dict(before=before, after=object_stats(repoPath), timings=timings, error=error)
+
+
+class MaintenanceScheduler:
+    """
+    Decides which repositories of a datashelf are due for maintenance and runs
+    the tasks with a bounded pool of workers.
+
+    Parameters
+    ----------
+    pathToDatashelf : str
+    locks : DatashelfLocks, optional
+        Locks of the datashelf, held while a repository is maintained.
+    """
+
+    def __init__(self, pathToDatashelf, locks=None):
+        self.pathToDatashelf = pathToDatashelf
+        self.locks = locks
+        self.stateFile = os.path.join(pathToDatashelf, ".git", config.MAINTENANCE_STATE_FILE)
+        self.last_run = dict()
+        if os.path.exists(self.stateFile):
+            with open(self.stateFile, "r") as f:
+                self.last_run = json.load(f)
+
+    def _repo_path(self, repoName):
+        if repoName == "main":
+            return self.pathToDatashelf
+        return os.path.join(self.pathToDatashelf, "database", repoName)
+
+    def _save(self):
+        tmpPath = f"{self.stateFile}.{os.getpid()}.tmp"
+        with open(tmpPath, "w") as f:
+            json.dump(self.last_run, f, indent=1, sort_keys=True)
+        os.replace(tmpPath, self.stateFile)
+
+    def is_due(self, repoName, stats):
+        """
+        A repository is due if it exceeds the thresholds or was not maintained
+        within config.MAINTENANCE_INTERVAL seconds.
+        """
+        if exceeds_thresholds(stats):
+            return True
+        last_run = self.last_run.get(repoName)
+        return last_run is None or time.time() - last_run > config.MAINTENANCE_INTERVAL
+
+    def stats(self, repoNames, workers=None):
+        """
+        Return the object statistics of repositories as DataFrame.
+        """
+        with ThreadPoolExecutor(max_workers=workers or config.MAINTENANCE_WORKERS) as executor:
+            stats = list(executor.map(lambda name: object_stats(self._repo_path(name)), repoNames))
+        return pd.DataFrame(stats, index=pd.Index(list(repoNames), name="SOURCE_ID"))
+
+    def _maintain(self, repoName, tasks):
+        repoPath = self._repo_path(repoName)
+        if self.locks is None:
+            return maintain_repository(repoPath, tasks)
+        with self.locks.lock(repoName):
+            return maintain_repository(repoPath, tasks)
+
+    def run(self, repoNames, tasks=None, workers=None, force=False):
+        """
+        Maintain all due repositories (or all if force is True).
+
+        Parameters
+        ----------
+        repoNames : list of str
+            Source IDs and/or "main".
+        tasks : list of str, optional
+            Keys of TASKS. The default is config.MAINTENANCE_TASKS.
+        workers : int, optional
+            The default is config.MAINTENANCE_WORKERS.
+        force : bool, optional
+            Maintain all repositories. The default is False.
+
+        Returns
+        -------
+        report : pandas.DataFrame
+            One row per maintained repository with the object counts and
+            sizes before and after, the seconds per task and errors.
+        """
+        tasks = list(config.MAINTENANCE_TASKS if tasks is None else tasks)
+        unknown = set(tasks).difference(TASKS)
+        if unknown:
+            raise ValueError(f"Unknown maintenance tasks: {sorted(unknown)}")
+        workers = workers or config.MAINTENANCE_WORKERS
+
+        repoNames = list(repoNames)
+        if force:
+            due = repoNames
+        else:
+            stats = self.stats(repoNames, workers)
+            due = [name for name in repoNames if self.is_due(name, stats.loc[name])]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = dict(zip(due, executor.map(lambda name: self._maintain(name, tasks), due)))
+
+        rows = list()
+        now = time.time()
+        for repoName, result in results.items():
+            if result["error"] is None:
+                self.last_run[repoName] = now
+            row = dict(SOURCE_ID=repoName)
+            for key in ["loose_objects", "packs", "size"]:
+                row[f"{key}_before"] = result["before"][key]
+                row[f"{key}_after"] = result["after"][key]
+            for task in tasks:
+                row[f"{task}_seconds"] = result["timings"].get(task)
+            row["seconds"] = sum(result["timings"].values())
+            row["error"] = result["error"]
+            rows.append(row)
+        if results:
+            self._save()
+
+        columns = (
+            ["SOURCE_ID"]
+            + [f"{key}_{when}" for key in ["loose_objects", "packs", "size"] for when in ["before", "after"]]
+            + [f"{task}_seconds" for task in tasks]
+            + ["seconds", "error"]
+        )
+        return pd.DataFrame(rows, columns=columns).set_index("SOURCE_ID")
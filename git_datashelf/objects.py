@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pooled access to the git object databases of the sources
+
+Every repository gets one long-lived "git cat-file --batch" and
+"git cat-file --batch-check" process, so that object lookups and blob reads
+do not start a new git process. Processes that were not used for
+config.OBJECT_POOL_IDLE_TIMEOUT seconds are closed and the pool keeps at most
+config.OBJECT_POOL_SIZE repositories open.
+
+@author: andreasgeiges
+"""
+import subprocess
+import threading
+import time
+import weakref
+
+from collections import OrderedDict
+
+from . import config
+
+
+def _terminate(processes):
+    for proc in processes.values():
+        if proc.poll() is None:
+            proc.stdin.close()
+            proc.wait()
+
+
+class CatFileProcess:
+    """
+    Persistent cat-file processes of one repository.
+    """
+
+    def __init__(self, git_dir):
+        self.git_dir = git_dir
+        self.processes = dict()
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self._finalizer = weakref.finalize(self, _terminate, self.processes)
+
+    def _get_process(self, mode):
+        proc = self.processes.get(mode)
+        if proc is None or proc.poll() is not None:
+            proc = subprocess.Popen(
+                ["git", "--git-dir", self.git_dir, "cat-file", mode],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+            self.processes[mode] = proc
+        return proc
+
+    def _request(self, mode, rev):
+        proc = self._get_process(mode)
+        proc.stdin.write(rev.encode() + b"\n")
+        proc.stdin.flush()
+        header = proc.stdout.readline().decode().rstrip("\n")
+        if header.endswith((" missing", " ambiguous")) or not header:
+            return proc, None
+        sha, objectType, size = header.split(" ")
+        return proc, (sha, objectType, int(size))
+
+    def info(self, rev):
+        """
+        Return (sha, type, size) of an object or None if it does not exist.
+        rev can be any expression understood by git, e.g. "v1.0^{commit}" or
+        "HEAD:tables/data.csv".
+        """
+        with self.lock:
+            self.last_used = time.monotonic()
+            return self._request("--batch-check", rev)[1]
+
+    def read(self, rev):
+        """
+        Return (sha, type, content) of an object or None if it does not exist.
+        """
+        with self.lock:
+            self.last_used = time.monotonic()
+            proc, info = self._request("--batch", rev)
+            if info is None:
+                return None
+            sha, objectType, size = info
+            content = proc.stdout.read(size)
+            proc.stdout.read(1)
+            return sha, objectType, content
+
+    def close(self):
+        with self.lock:
+            _terminate(self.processes)
+            self.processes.clear()
+
+
+class ObjectPool:
+    """
+    Pool of CatFileProcess instances keyed by git dir with idle eviction.
+    """
+
+    def __init__(self, max_size=None, idle_timeout=None):
+        self.max_size = config.OBJECT_POOL_SIZE if max_size is None else max_size
+        self.idle_timeout = (
+            config.OBJECT_POOL_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        )
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, git_dir):
+        """
+        Return the cat-file processes of the repository at git_dir.
+        """
+        with self.lock:
+            self._evict_idle()
+            entry = self.entries.get(git_dir)
+            if entry is None:
+                # close the least recently used repositories
+                while self.entries and len(self.entries) >= self.max_size:
+                    _, lru_entry = self.entries.popitem(last=False)
+                    lru_entry.close()
+                entry = CatFileProcess(git_dir)
+                self.entries[git_dir] = entry
+            self.entries.move_to_end(git_dir)
+            return entry
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        for git_dir, entry in list(self.entries.items()):
+            if now - entry.last_used > self.idle_timeout:
+                entry.close()
+                del self.entries[git_dir]
+
+    def close_idle(self):
+        """
+        Close all processes that exceeded the idle timeout.
+        """
+        with self.lock:
+            self._evict_idle()
+
+    def close(self):
+        with self.lock:
+            for entry in self.entries.values():
+                entry.close()
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
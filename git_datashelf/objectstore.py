@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared object store of the source repositories
+
+The store is a bare repository in the .git folder of the main repository.
+Sharing a source fetches all its refs into the store under
+refs/sources/<SOURCE_ID>/, so the objects stay referenced, adds the store to
+objects/info/alternates of the source and repacks the source without the
+objects available in the store. New clones use the store with --reference, so
+only objects missing in the store are downloaded, and fetches advertise the
+objects of the store to the remote.
+
+The store must not be deleted while sources borrow objects from it.
+
+@author: andreasgeiges
+"""
+import os
+import subprocess
+
+from . import config
+from .lazy import lazy_import
+from .maintenance import object_stats
+
+pd = lazy_import("pandas")
+
+
+def _git(args, cwd=None):
+    return subprocess.run(
+        ["git"] + list(args),
+        cwd=cwd,
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ).stdout.decode()
+
+
+def reachable_size(repoPath):
+    """
+    Return the on-disk size in bytes of all objects reachable from the refs of
+    a repository, including the objects borrowed from alternates.
+    """
+    if not _git(["for-each-ref", "--count=1"], cwd=repoPath).strip():
+        return 0
+    return int(_git(["rev-list", "--objects", "--all", "--disk-usage"], cwd=repoPath))
+
+
+class SharedObjectStore:
+    """
+    Bare repository holding the objects shared by the sources of a datashelf.
+
+    Parameters
+    ----------
+    pathToDatashelf : str
+    """
+
+    def __init__(self, pathToDatashelf):
+        self.pathToDatashelf = pathToDatashelf
+        self.path = os.path.join(pathToDatashelf, ".git", config.SHARED_OBJECT_STORE_DIR)
+        self.objects_dir = os.path.join(self.path, "objects")
+
+    def exists(self):
+        return os.path.isdir(self.objects_dir)
+
+    def init(self):
+        """
+        Create the store if it does not exist.
+        """
+        if not self.exists():
+            _git(["init", "--quiet", "--bare", self.path])
+            # objects of the store are referenced by the sources, never prune
+            # them by age
+            _git(["config", "gc.pruneExpire", "never"], cwd=self.path)
+        return self
+
+    def clone_kwargs(self):
+        """
+        Keyword arguments of git.Repo.clone_from to borrow the objects of the
+        store.
+        """
+        if not self.exists():
+            return dict()
+        return dict(reference_if_able=self.path)
+
+    def _alternates_file(self, repoPath):
+        return os.path.join(repoPath, ".git", "objects", "info", "alternates")
+
+    def is_shared(self, repoPath):
+        """
+        Check if a repository borrows objects from the store.
+        """
+        alternatesFile = self._alternates_file(repoPath)
+        if not os.path.exists(alternatesFile):
+            return False
+        with open(alternatesFile, "r") as f:
+            alternates = [line.strip() for line in f]
+        return os.path.realpath(self.objects_dir) in {
+            os.path.realpath(os.path.join(os.path.dirname(alternatesFile), path))
+            for path in alternates
+            if path and not path.startswith("#")
+        }
+
+    def add_source(self, sourceID, repoPath):
+        """
+        Move the objects of a source into the store. The source keeps its refs
+        and reads the objects through objects/info/alternates.
+
+        Returns
+        -------
+        stats : dict
+            Object statistics of the source before and after.
+        """
+        self.init()
+        before = object_stats(repoPath)
+        # keep the fetched objects as pack, prune-packed in the source only
+        # drops loose objects contained in packs
+        _git(
+            [
+                "-c",
+                "fetch.unpackLimit=1",
+                "fetch",
+                "--quiet",
+                "--no-tags",
+                "--prune",
+                "--update-shallow",
+                os.path.abspath(repoPath),
+                f"+refs/heads/*:refs/sources/{sourceID}/heads/*",
+                f"+refs/tags/*:refs/sources/{sourceID}/tags/*",
+            ],
+            cwd=self.path,
+        )
+        if not self.is_shared(repoPath):
+            alternatesFile = self._alternates_file(repoPath)
+            os.makedirs(os.path.dirname(alternatesFile), exist_ok=True)
+            with open(alternatesFile, "a") as f:
+                f.write(os.path.abspath(self.objects_dir) + "\n")
+        # keep only the objects that are not in the store
+        _git(["repack", "-a", "-d", "-l", "-q"], cwd=repoPath)
+        _git(["prune-packed"], cwd=repoPath)
+        if object_stats(self.path)["packs"] > config.MAINTENANCE_MAX_PACKS:
+            self.repack()
+        return dict(before=before, after=object_stats(repoPath))
+
+    def repack(self):
+        """
+        Consolidate the packs of the store. Objects fetched from several
+        sources are contained in several packs until the store is repacked.
+        Unreachable objects are kept, since sources may still borrow them.
+        """
+        _git(["repack", "-a", "-d", "-k", "-q"], cwd=self.path)
+
+    def disk_usage(self, repoPaths):
+        """
+        Report the disk usage of sources with and without the store.
+
+        Parameters
+        ----------
+        repoPaths : dict
+            Paths of the source repositories by source ID.
+
+        Returns
+        -------
+        report : pandas.DataFrame
+            Indexed by SOURCE_ID with the columns shared, local_size (bytes
+            in the repository), reachable_size (bytes of all objects the
+            source requires) and borrowed_size (bytes read from the store).
+        """
+        rows = list()
+        for sourceID, repoPath in repoPaths.items():
+            local = object_stats(repoPath)["size"]
+            reachable = reachable_size(repoPath)
+            rows.append(
+                dict(
+                    SOURCE_ID=sourceID,
+                    shared=self.is_shared(repoPath),
+                    local_size=local,
+                    reachable_size=reachable,
+                    borrowed_size=max(reachable - local, 0),
+                )
+            )
+        columns = ["SOURCE_ID", "shared", "local_size", "reachable_size", "borrowed_size"]
+        return pd.DataFrame(rows, columns=columns).set_index("SOURCE_ID")
+
+    def savings(self, report):
+        """
+        Return the total sizes in bytes of the sources without and with the
+        store and the saved bytes for a report of disk_usage.
+        """
+        store_size = object_stats(self.path)["size"] if self.exists() else 0
+        without_store = int(report["local_size"].sum() + report["borrowed_size"].sum())
+        with_store = int(report["local_size"].sum()) + store_size
+        return dict(
+            without_store=without_store,
+            with_store=with_store,
+            store_size=store_size,
+            saved=without_store - with_store,
+        )
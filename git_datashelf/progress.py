@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+tqdm progress bars of git transport operations
+
+@author: andreasgeiges
+"""
+import git
+import tqdm
+
+
+class TqdmProgressPrinter(git.RemoteProgress):
+    known_ops = {
+        git.RemoteProgress.COUNTING: "counting objects",
+        git.RemoteProgress.COMPRESSING: "compressing objects",
+        git.RemoteProgress.WRITING: "writing objects",
+        git.RemoteProgress.RECEIVING: "receiving objects",
+        git.RemoteProgress.RESOLVING: "resolving stuff",
+        git.RemoteProgress.FINDING_SOURCES: "finding sources",
+        git.RemoteProgress.CHECKING_OUT: "checking things out",
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.progressbar = None
+
+    def update(self, op_code, cur_count, max_count=None, message=""):
+        if op_code & self.BEGIN:
+            desc = self.known_ops.get(op_code & self.OP_MASK)
+            self.progressbar = tqdm.tqdm(desc=desc, total=max_count)
+
+        self.progressbar.set_postfix_str(message, refresh=False)
+        self.progressbar.update(cur_count)
+
+        if op_code & self.END:
+            self.progressbar.close()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Source registry backends for the content of sources.csv
+
+The registry keeps one row per source in memory, supports row-level upserts
+and writes sources.csv only once per flush. The SQLite backend additionally
+stores the rows in the .git folder of the main repository, so it does not
+need to parse sources.csv again if the file did not change. A flush only
+upserts the rows modified since the last flush. Upserts stay in memory until
+the flush with both backends, so other processes never load rows that are
+not committed yet.
+
+@author: andreasgeiges
+"""
+import csv
+import io
+import os
+import json
+import sqlite3
+
+from . import config
+from .lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+INDEX_FIELD = "SOURCE_ID"
+
+
+def _file_state(filePath):
+    if not os.path.exists(filePath):
+        return None
+    stat = os.stat(filePath)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class SourceRegistry:
+    """
+    In-memory registry of sources that is read from and flushed to a csv file.
+    """
+
+    def __init__(self, sourceFile):
+        self.sourceFile = sourceFile
+        self.columns = list()
+        self.rows = dict()
+        self.modified = False
+        self.pending = dict()
+        self.csv_state = None
+        self._view = None
+        self.load()
+
+    def load(self):
+        self._read_csv()
+
+    def _read_csv(self):
+        with open(self.sourceFile, "r", newline="") as f:
+            self._read_rows(f)
+        self.csv_state = _file_state(self.sourceFile)
+
+    def _read_rows(self, f):
+        self.columns = list()
+        self.rows = dict()
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            header = list(config.SOURCE_META_FIELDS)
+        index_pos = header.index(INDEX_FIELD)
+        self.columns = [field for field in header if field != INDEX_FIELD]
+        for row in reader:
+            if not row:
+                continue
+            sourceID = row[index_pos]
+            self.rows[sourceID] = {
+                field: (value if value != "" else None)
+                for field, value in zip(header, row)
+                if field != INDEX_FIELD
+            }
+        self._view = None
+        self.modified = False
+
+    #%% row access
+    def __contains__(self, sourceID):
+        return sourceID in self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, sourceID, field):
+        return self.rows[sourceID].get(field)
+
+    def upsert(self, sourceID, fields, replace=False):
+        """
+        Insert or update the row of a source.
+
+        Parameters
+        ----------
+        sourceID : str
+        fields : dict
+            Field values of the source.
+        replace : bool, optional
+            Replace the complete row, fields that are not columns of the
+            registry are ignored. Otherwise only the given fields are updated
+            and new columns are added if required. The default is False.
+
+        """
+        if replace:
+            row = {field: fields.get(field) for field in self.columns}
+        else:
+            row = dict(self.rows.get(sourceID, {field: None for field in self.columns}))
+            for field, value in fields.items():
+                if field == INDEX_FIELD:
+                    continue
+                if field not in self.columns:
+                    self._add_column(field)
+                row[field] = value
+        row = {field: self._to_value(value) for field, value in row.items()}
+        if replace or sourceID not in self.pending:
+            self.pending[sourceID] = (dict(fields), replace)
+        else:
+            self.pending[sourceID][0].update(fields)
+        self.rows[sourceID] = row
+        self.modified = True
+        self._view = None
+
+    @staticmethod
+    def _to_value(value):
+        # all values are stored as in the csv file
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return None
+        return str(value)
+
+    def _add_column(self, field):
+        self.columns.append(field)
+        for row in self.rows.values():
+            row[field] = None
+
+    def refresh(self):
+        """
+        Re-read sources.csv if it was written by another process since it was
+        read or flushed, and apply the upserts of this registry again.
+        Returns True if the file was re-read.
+        """
+        if _file_state(self.sourceFile) == self.csv_state:
+            return False
+        pending = self.pending
+        self.load()
+        self.pending = dict()
+        for sourceID, (fields, replace) in pending.items():
+            self.upsert(sourceID, fields, replace=replace)
+        return True
+
+    #%% export
+    def to_dataframe(self):
+        """
+        Return the registry as a DataFrame indexed by SOURCE_ID. The frame is
+        cached until the next upsert and must be treated as read-only.
+        """
+        if self._view is None:
+            df = pd.DataFrame.from_dict(
+                self.rows, orient="index", columns=self.columns
+            )
+            if len(self.rows) == 0:
+                df = pd.DataFrame(columns=self.columns)
+            df.index.name = INDEX_FIELD
+            self._view = df
+        return self._view
+
+    def write_csv(self, filePath):
+        """
+        Write a deterministic csv export in registry order.
+        """
+        tmpPath = filePath + ".tmp"
+        with open(tmpPath, "w", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow([INDEX_FIELD] + self.columns)
+            for sourceID, row in self.rows.items():
+                writer.writerow(
+                    [sourceID]
+                    + ["" if row[field] is None else row[field] for field in self.columns]
+                )
+        os.replace(tmpPath, filePath)
+
+    def flush(self):
+        """
+        Write sources.csv if there are changes since the last flush.
+        """
+        if self.modified or not os.path.exists(self.sourceFile):
+            self.write_csv(self.sourceFile)
+            self.modified = False
+        self.csv_state = _file_state(self.sourceFile)
+        self.pending = dict()
+        return self.sourceFile
+
+    def close(self):
+        pass
+
+
+class SQLiteSourceRegistry(SourceRegistry):
+    """
+    Registry storing the flushed rows in a SQLite database. sources.csv stays
+    the version controlled export and is re-imported when it was changed
+    outside of the registry, e.g. by a git pull. Upserts are only stored by
+    flush, like sources.csv, which writes the modified rows only.
+    """
+
+    def __init__(self, sourceFile, databaseFile):
+        self.databaseFile = databaseFile
+        self.connection = sqlite3.connect(databaseFile, check_same_thread=False)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sources (
+                SOURCE_ID TEXT PRIMARY KEY,
+                fields TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+        super().__init__(sourceFile)
+
+    def _get_meta(self, key):
+        result = self.connection.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return None if result is None else json.loads(result[0])
+
+    def _set_meta(self, key, value):
+        self.connection.execute(
+            "INSERT INTO meta VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value)),
+        )
+
+    def load(self):
+        if self._get_meta("csv_state") == _file_state(self.sourceFile):
+            self.columns = self._get_meta("columns")
+            # rows stored before a column was added lack the column
+            self.rows = {
+                sourceID: self._get_row(fields)
+                for sourceID, fields in self.connection.execute(
+                    "SELECT SOURCE_ID, fields FROM sources ORDER BY rowid"
+                )
+            }
+            self.modified = False
+            self.csv_state = _file_state(self.sourceFile)
+            self._view = None
+            return
+
+        # import sources.csv
+        self._read_csv()
+        self._store_rows()
+
+    def _get_row(self, fields):
+        fields = json.loads(fields)
+        return {field: fields.get(field) for field in self.columns}
+
+    def _store_rows(self):
+        with self.connection:
+            self.connection.execute("DELETE FROM sources")
+            self.connection.executemany(
+                "INSERT INTO sources VALUES (?, ?)",
+                [(sourceID, json.dumps(row)) for sourceID, row in self.rows.items()],
+            )
+            self._set_meta("columns", self.columns)
+            self._set_meta("csv_state", self.csv_state)
+
+    def _upsert_rows(self, sourceIDs):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO sources VALUES (?, ?) "
+                "ON CONFLICT(SOURCE_ID) DO UPDATE SET fields = excluded.fields",
+                [(sourceID, json.dumps(self.rows[sourceID])) for sourceID in sourceIDs],
+            )
+            self._set_meta("columns", self.columns)
+            self._set_meta("csv_state", self.csv_state)
+
+    def flush(self):
+        # the database holds the rows of the loaded sources.csv, unless
+        # another registry stored a different state since
+        stored = self._get_meta("csv_state") == self.csv_state
+        pending = list(self.pending)
+        super().flush()
+        if stored:
+            self._upsert_rows(pending)
+        else:
+            self._store_rows()
+        return self.sourceFile
+
+    def close(self):
+        self.connection.close()
+
+
+class SnapshotRegistry(SourceRegistry):
+    """
+    Read-only registry of the content of sources.csv at a commit of the main
+    repository.
+    """
+
+    def __init__(self, sourceFile, content):
+        self.content = content
+        super().__init__(sourceFile)
+
+    def load(self):
+        self._read_rows(io.StringIO(self.content.decode(), newline=""))
+
+    def upsert(self, sourceID, fields, replace=False):
+        raise RuntimeError("The source registry of a snapshot is read-only")
+
+    def refresh(self):
+        return False
+
+    def flush(self):
+        raise RuntimeError("The source registry of a snapshot is read-only")
+
+
+def get_source_registry(sourceFile, backend=None):
+    """
+    Create the source registry for a sources.csv file.
+
+    Parameters
+    ----------
+    sourceFile : str
+        Path to sources.csv.
+    backend : str, optional
+        "csv" or "sqlite". The default is config.SOURCE_REGISTRY_BACKEND.
+
+    Returns
+    -------
+    registry : SourceRegistry
+
+    """
+    if backend is None:
+        backend = config.SOURCE_REGISTRY_BACKEND
+
+    if backend == "csv":
+        return SourceRegistry(sourceFile)
+    elif backend == "sqlite":
+        git_dir = os.path.join(os.path.dirname(os.path.abspath(sourceFile)), ".git")
+        return SQLiteSourceRegistry(
+            sourceFile, os.path.join(git_dir, config.SOURCE_REGISTRY_DATABASE_FILE)
+        )
+    else:
+        raise ValueError(f"Unknown source registry backend: {backend}")
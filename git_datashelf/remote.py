@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Asyncio helpers to run git transport commands of many repositories with a
+bounded concurrency
+
+@author: andreasgeiges
+"""
+from . import config
+from .lazy import lazy_import
+
+asyncio = lazy_import("asyncio")
+git = lazy_import("git")
+
+
+async def run_git(cwd, args):
+    """
+    Run a git command in cwd as asyncio subprocess.
+
+    Returns
+    -------
+    stdout : str
+
+    Raises
+    ------
+    git.GitCommandError if git exits with a non-zero status.
+    """
+    command = ["git"] + list(args)
+    proc = await asyncio.create_subprocess_exec(
+        *command,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise git.GitCommandError(command, proc.returncode, stderr, stdout)
+    return stdout.decode()
+
+
+async def run_git_commands(commands, max_concurrency=None, span=None, operation=None):
+    """
+    Run git commands of multiple repositories with at most max_concurrency
+    processes at the same time.
+
+    Parameters
+    ----------
+    commands : dict
+        Mapping of a key to a tuple (cwd, args).
+    max_concurrency : int, optional
+        The default is config.REMOTE_CONCURRENCY.
+    span : callable, optional
+        Instrumentation.span used to time each command as operation tagged
+        with its key. The default is None.
+    operation : str, optional
+        Operation name of the timed spans.
+
+    Returns
+    -------
+    results : dict
+        Mapping of each key to the stdout of the command or the raised
+        exception.
+    """
+    if max_concurrency is None:
+        max_concurrency = config.REMOTE_CONCURRENCY
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def bounded(key, cwd, args):
+        async with semaphore:
+            if span is None:
+                return await run_git(cwd, args)
+            with span(operation, key):
+                return await run_git(cwd, args)
+
+    keys = list(commands)
+    results = await asyncio.gather(
+        *[bounded(key, *commands[key]) for key in keys], return_exceptions=True
+    )
+    return dict(zip(keys, results))
+
+
+def raise_git_failures(results, operation):
+    """
+    Raise a RuntimeError listing all failed commands of run_git_commands.
+    """
+    failures = {
+        key: result for key, result in results.items() if isinstance(result, Exception)
+    }
+    if failures:
+        raise RuntimeError(
+            "{} failed for {} of {} sources:\n".format(
+                operation, len(failures), len(results)
+            )
+            + "\n".join(f"  {key}: {error}" for key, error in sorted(failures.items()))
+        )
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batched staging of files in the index of a repository
+
+Files added multiple times are staged once, files whose stat information
+matches the index entry are skipped and the remaining files are hashed and
+written to the index by a single "git update-index" call.
+
+@author: andreasgeiges
+"""
+import os
+import subprocess
+
+from .lazy import lazy_import
+
+git = lazy_import("git")
+
+
+def _relative_paths(workingDir, filePaths):
+    """
+    Return the deduplicated paths relative to the work tree, expanding
+    folders to the files they contain.
+    """
+    relPaths = dict()
+    for filePath in filePaths:
+        absPath = os.path.normpath(os.path.join(workingDir, str(filePath)))
+        relPath = os.path.relpath(absPath, workingDir)
+        if relPath == os.pardir or relPath.startswith(os.pardir + os.sep):
+            raise ValueError(f"{filePath} is outside of the repository {workingDir}")
+        if os.path.isdir(absPath) and not os.path.islink(absPath):
+            for folder, dirs, files in os.walk(absPath):
+                dirs[:] = [name for name in dirs if name != ".git"]
+                for name in files:
+                    relPaths[os.path.relpath(os.path.join(folder, name), workingDir)] = None
+        else:
+            relPaths[relPath] = None
+    return list(relPaths)
+
+
+def _is_unchanged(entry, stat, index_mtime):
+    if entry is None:
+        return False
+    if entry.size != stat.st_size % 2**32:
+        return False
+    if entry.mtime != (int(stat.st_mtime), stat.st_mtime_ns % 10**9):
+        return False
+    # racily clean entries, modified in the same second the index was written
+    return entry.mtime[0] < index_mtime
+
+
+def stage_files(repo, filePaths):
+    """
+    Stage files in the index of repo, similar to repo.index.add(filePaths).
+
+    Parameters
+    ----------
+    repo : git.Repo
+    filePaths : list
+        Absolute paths or paths relative to the work tree. Duplicates are
+        staged once and tracked files that do not exist anymore are removed
+        from the index.
+
+    Returns
+    -------
+    staged : list
+        Relative paths that were hashed and written to the index. Files with
+        unchanged stat information are skipped.
+
+    Raises
+    ------
+    FileNotFoundError if an untracked file does not exist.
+    git.GitCommandError if git update-index fails.
+    """
+    workingDir = repo.working_tree_dir
+    relPaths = _relative_paths(workingDir, filePaths)
+    if not relPaths:
+        return []
+
+    indexPath = os.path.join(repo.git_dir, "index")
+    if os.path.exists(indexPath):
+        index_mtime = int(os.stat(indexPath).st_mtime)
+        entries = repo.index.entries
+    else:
+        index_mtime = 0
+        entries = dict()
+
+    staged = list()
+    for relPath in relPaths:
+        key = (relPath.replace(os.sep, "/"), 0)
+        try:
+            stat = os.lstat(os.path.join(workingDir, relPath))
+        except FileNotFoundError:
+            # removed files are removed from the index
+            if key not in entries:
+                raise
+            staged.append(relPath)
+            continue
+        if not _is_unchanged(entries.get(key), stat, index_mtime):
+            staged.append(relPath)
+
+    if staged:
+        command = ["git", "update-index", "--add", "--remove", "-z", "--stdin"]
+        proc = subprocess.run(
+            command,
+            cwd=workingDir,
+            input=b"\0".join(os.fsencode(path) for path in staged) + b"\0",
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        if proc.returncode != 0:
+            raise git.GitCommandError(command, proc.returncode, proc.stderr, proc.stdout)
+    return staged
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chunked columnar storage of source tables
+
+A table is stored as folder of Parquet files, one per value (combination) of
+the chunk_by columns, e.g. one file per region. The folder contains the
+manifest _table.json listing the chunks. Chunks whose content did not change
+are not rewritten, so a revision only adds the modified chunks to git.
+Loading supports column selection and pyarrow filters, which skip chunk files
+by the manifest and row groups by their statistics.
+
+Requires the optional dependency pyarrow.
+
+@author: andreasgeiges
+"""
+import os
+import io
+import json
+import importlib.util
+
+from urllib.parse import quote
+
+from .lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+HAS_ARROW = importlib.util.find_spec("pyarrow") is not None
+
+MANIFEST_FILE = "_table.json"
+UNNAMED_INDEX = "__index_level_{}__"
+
+
+def _check_arrow():
+    if not HAS_ARROW:
+        raise ImportError(
+            "Chunked tables require pyarrow, install git_datashelf[parquet]"
+        )
+
+
+def _chunk_file_name(chunk_by, values):
+    if not chunk_by:
+        return "chunk.parquet"
+    return "__".join(
+        f"{quote(str(column), safe='')}={quote(str(value), safe='')}"
+        for column, value in zip(chunk_by, values)
+    ) + ".parquet"
+
+
+def _to_json_value(value):
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+def _to_bytes(chunk, row_group_size):
+    buffer = io.BytesIO()
+    chunk.to_parquet(buffer, engine="pyarrow", index=False, row_group_size=row_group_size)
+    return buffer.getvalue()
+
+
+def write_chunked_table(table, folder, chunk_by=None, row_group_size=None):
+    """
+    Write a table as chunked Parquet folder.
+
+    Parameters
+    ----------
+    table : pandas.DataFrame
+    folder : str
+        Folder of the chunks, created if required.
+    chunk_by : list of str, optional
+        Columns (or index levels) defining the chunks. The default is None,
+        writing a single chunk.
+    row_group_size : int, optional
+        Maximal number of rows per row group. The default is the pyarrow
+        default.
+
+    Returns
+    -------
+    written : list
+        Paths of the chunk files and the manifest that were written.
+    removed : list
+        Paths of the chunk files of a previous version that were deleted.
+    """
+    _check_arrow()
+    chunk_by = list(chunk_by or [])
+
+    # keep named indices as columns to restore them when loading
+    if isinstance(table.index, pd.RangeIndex) and table.index.name is None:
+        index = list()
+        data = table.reset_index(drop=True)
+    else:
+        index = [
+            name if name is not None else UNNAMED_INDEX.format(i)
+            for i, name in enumerate(table.index.names)
+        ]
+        data = table.rename_axis(index).reset_index()
+
+    os.makedirs(folder, exist_ok=True)
+    manifestPath = os.path.join(folder, MANIFEST_FILE)
+    old_chunks = dict()
+    if os.path.exists(manifestPath):
+        with open(manifestPath, "r") as f:
+            old_chunks = {chunk["file"]: chunk for chunk in json.load(f)["chunks"]}
+
+    if chunk_by:
+        groups = data.groupby(chunk_by, sort=True, dropna=False)
+        groups = [
+            ((values if isinstance(values, tuple) else (values,)), chunk)
+            for values, chunk in groups
+        ]
+    else:
+        groups = [((), data)]
+
+    written = list()
+    chunks = list()
+    for values, chunk in groups:
+        fileName = _chunk_file_name(chunk_by, values)
+        filePath = os.path.join(folder, fileName)
+        content = _to_bytes(chunk.reset_index(drop=True), row_group_size)
+        if fileName not in old_chunks or not os.path.exists(filePath) or (
+            os.path.getsize(filePath) != len(content) or _read_bytes(filePath) != content
+        ):
+            with open(filePath, "wb") as f:
+                f.write(content)
+            written.append(filePath)
+        chunks.append(
+            dict(
+                file=fileName,
+                values=[_to_json_value(value) for value in values],
+                rows=len(chunk),
+            )
+        )
+
+    removed = list()
+    new_files = {chunk["file"] for chunk in chunks}
+    for fileName in sorted(set(old_chunks).difference(new_files)):
+        filePath = os.path.join(folder, fileName)
+        if os.path.exists(filePath):
+            os.remove(filePath)
+        removed.append(filePath)
+
+    manifest = dict(
+        format="parquet",
+        chunk_by=chunk_by,
+        index=index,
+        columns=[str(column) for column in table.columns],
+        chunks=chunks,
+    )
+    content = json.dumps(manifest, indent=1, sort_keys=True).encode()
+    if not os.path.exists(manifestPath) or _read_bytes(manifestPath) != content:
+        with open(manifestPath, "wb") as f:
+            f.write(content)
+        written.append(manifestPath)
+    return written, removed
+
+
+def _read_bytes(filePath):
+    with open(filePath, "rb") as f:
+        return f.read()
+
+
+def select_chunks(manifest, filters=None):
+    """
+    Return the chunk files of a manifest that can contain rows matching the
+    filters. Only "==" and "in" conditions on chunk_by columns prune chunks.
+    """
+    chunks = manifest["chunks"]
+    for column, op, value in filters or []:
+        if column not in manifest["chunk_by"] or op not in ("==", "=", "in"):
+            continue
+        position = manifest["chunk_by"].index(column)
+        allowed = {str(v) for v in value} if op == "in" else {str(value)}
+        chunks = [chunk for chunk in chunks if str(chunk["values"][position]) in allowed]
+    return [chunk["file"] for chunk in chunks]
+
+
+def read_chunked_table(read_bytes, columns=None, filters=None):
+    """
+    Read a chunked table.
+
+    Parameters
+    ----------
+    read_bytes : callable
+        Function returning the content of a file of the table folder given its
+        name, e.g. reading from the work tree or the git object database.
+    columns : list, optional
+        Columns to load. The default is all columns.
+    filters : list of tuples, optional
+        pyarrow filters like [("region", "in", ["DEU", "FRA"]), ("year", ">",
+        2010)]. The default is None.
+
+    Returns
+    -------
+    table : pandas.DataFrame
+    """
+    _check_arrow()
+    manifest = json.loads(read_bytes(MANIFEST_FILE))
+    index = manifest["index"]
+    if columns is not None:
+        columns = index + [column for column in columns if column not in index]
+
+    parts = [
+        pd.read_parquet(
+            io.BytesIO(read_bytes(fileName)),
+            engine="pyarrow",
+            columns=columns,
+            filters=filters,
+        )
+        for fileName in select_chunks(manifest, filters)
+    ]
+    if parts:
+        table = pd.concat(parts, ignore_index=True)
+    else:
+        table = pd.DataFrame(columns=columns if columns is not None else index + manifest["columns"])
+    if index:
+        table = table.set_index(index)
+        table.index.names = [
+            None if name == UNNAMED_INDEX.format(i) else name
+            for i, name in enumerate(index)
+        ]
+    return table
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Index of the version tags of a source repository read directly from the
+refs in the .git folder
+
+@author: andreasgeiges
+"""
+import os
+import subprocess
+import time
+import zlib
+
+from .lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# margin in ns for modifications within the timestamp granularity of the file
+# system (see TagIndex.refresh)
+RACY_NS = 10**9
+
+
+def version_of_tag(tagName):
+    """
+    Return the version number of a tag like "v3.0" or None for other tags.
+    """
+    try:
+        return float(tagName.replace("v", ""))
+    except ValueError:
+        return None
+
+
+def parse_versions(tags):
+    """
+    Vectorized version_of_tag of a Series of tags. Returns a float Series
+    with NaN for missing or other tags.
+    """
+    versions = pd.to_numeric(
+        tags.astype("string").str.replace("v", "", regex=False), errors="coerce"
+    )
+    return versions.astype(float)
+
+
+def read_ref(git_dir, refName):
+    """
+    Return the sha of a ref from the loose refs or packed-refs of a
+    repository, or None if the ref does not exist.
+    """
+    filePath = os.path.join(git_dir, refName)
+    if os.path.isfile(filePath):
+        with open(filePath, "r") as f:
+            content = f.read().strip()
+        if content.startswith("ref: "):
+            return read_ref(git_dir, content[5:])
+        return content
+
+    packedPath = os.path.join(git_dir, "packed-refs")
+    if os.path.exists(packedPath):
+        with open(packedPath, "r") as f:
+            for line in f:
+                if line.startswith(("#", "^")):
+                    continue
+                sha, _, name = line.strip().partition(" ")
+                if name == refName:
+                    return sha
+    return None
+
+
+def read_head(git_dir):
+    """
+    Return the commit sha of HEAD without starting a git process.
+    """
+    return read_ref(git_dir, "HEAD")
+
+
+class TagIndex:
+    """
+    Index tag -> commit sha -> version number of one repository.
+
+    The index is built from refs/tags and packed-refs in a single pass and
+    rebuilt by refresh() whenever these refs changed. Annotated tags are
+    resolved with the cat-file processes of objectPool if given.
+    """
+
+    def __init__(self, git_dir, objectPool=None):
+        self.git_dir = git_dir
+        self.objectPool = objectPool
+        self.state = None
+        self.state_time = None
+        self.tag_dirs = [os.path.join(git_dir, "refs", "tags")]
+        self.tags = dict()
+        self.by_commit = dict()
+        self.latest = None
+
+    def _refs_state(self):
+        """
+        Return the mtimes of packed-refs and of the refs/tags directories.
+        git writes refs via a lock file that is renamed, so creating, moving
+        or deleting a loose tag changes the mtime of its directory.
+        """
+        packedPath = os.path.join(self.git_dir, "packed-refs")
+        if os.path.exists(packedPath):
+            stat = os.stat(packedPath)
+            packed = (stat.st_mtime_ns, stat.st_size)
+        else:
+            packed = None
+        dirs = list()
+        for dirPath in self.tag_dirs:
+            try:
+                dirs.append((dirPath, os.stat(dirPath).st_mtime_ns))
+            except FileNotFoundError:
+                dirs.append((dirPath, None))
+        return packed, tuple(dirs)
+
+    def _is_racy(self):
+        """
+        Modifications within the timestamp granularity of the file system
+        after the state was read are not visible in the mtimes.
+        """
+        packed, dirs = self.state
+        mtimes = [mtime for _, mtime in dirs if mtime is not None]
+        if packed is not None:
+            mtimes.append(packed[0])
+        return any(mtime >= self.state_time - RACY_NS for mtime in mtimes)
+
+    def _scan_loose(self):
+        """
+        Return the names of the loose tags and the refs/tags directories.
+        """
+        tagsPath = os.path.join(self.git_dir, "refs", "tags")
+        names = list()
+        dirs = [tagsPath]
+        for root, subdirs, files in os.walk(tagsPath):
+            dirs.extend(os.path.join(root, subdir) for subdir in subdirs)
+            for fileName in files:
+                names.append(
+                    os.path.relpath(os.path.join(root, fileName), tagsPath).replace(os.sep, "/")
+                )
+        return sorted(names), sorted(dirs)
+
+    def _peel(self, shas):
+        """
+        Resolve tag objects to the commits they point to with a single
+        git cat-file process.
+        """
+        if not shas:
+            return dict()
+        if self.objectPool is not None:
+            objects = self.objectPool.get(self.git_dir)
+            return {sha: objects.info(sha + "^{commit}")[0] for sha in shas}
+        proc = subprocess.run(
+            ["git", "--git-dir", self.git_dir, "cat-file", "--batch-check"],
+            input="".join(sha + "^{commit}\n" for sha in shas),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return {
+            sha: line.split(" ")[0]
+            for sha, line in zip(shas, proc.stdout.splitlines())
+        }
+
+    def build(self, state=None):
+        if state is None:
+            self.state_time = time.time_ns()
+            state = self._refs_state()
+        packed, _ = state
+        loose, tag_dirs = self._scan_loose()
+
+        refs = dict()
+        peeled = dict()
+        fully_peeled = False
+        if packed is not None:
+            with open(os.path.join(self.git_dir, "packed-refs"), "r") as f:
+                last_tag = None
+                for line in f:
+                    line = line.strip()
+                    if line.startswith("#"):
+                        if "fully-peeled" in line.split():
+                            fully_peeled = True
+                        continue
+                    if not line:
+                        continue
+                    if line.startswith("^"):
+                        if last_tag is not None:
+                            peeled[last_tag] = line[1:]
+                        continue
+                    sha, _, refName = line.partition(" ")
+                    if refName.startswith("refs/tags/"):
+                        last_tag = refName[len("refs/tags/"):]
+                        refs[last_tag] = sha
+                        if fully_peeled:
+                            # packed-refs lists the peeled value of every
+                            # annotated tag, so all others are commits
+                            peeled[last_tag] = sha
+                    else:
+                        last_tag = None
+
+        tagsPath = os.path.join(self.git_dir, "refs", "tags")
+        for tagName in loose:
+            with open(os.path.join(tagsPath, tagName), "r") as f:
+                refs[tagName] = f.read().strip()
+            peeled.pop(tagName, None)
+
+        # resolve annotated tags to commits
+        commits = dict()
+        unresolved = list()
+        for tagName, sha in refs.items():
+            if tagName in peeled:
+                commits[tagName] = peeled[tagName]
+            elif self._is_loose_commit(sha):
+                commits[tagName] = sha
+            else:
+                unresolved.append(tagName)
+        resolved = self._peel(sorted(set(refs[tagName] for tagName in unresolved)))
+        for tagName in unresolved:
+            commits[tagName] = resolved[refs[tagName]]
+
+        tags = {
+            tagName: (sha, version_of_tag(tagName)) for tagName, sha in commits.items()
+        }
+
+        by_commit = dict()
+        latest = None
+        for tagName, (sha, version) in tags.items():
+            by_commit.setdefault(sha, []).append(tagName)
+            if version is not None and (latest is None or version > tags[latest][1]):
+                latest = tagName
+        # highest version first if a commit carries multiple tags
+        for names in by_commit.values():
+            names.sort(key=lambda name: (tags[name][1] is None, -(tags[name][1] or 0)))
+
+        self.tags = tags
+        self.by_commit = by_commit
+        self.latest = latest
+        if tag_dirs == self.tag_dirs:
+            self.state = state
+        else:
+            # the state of new directories is read by the next refresh
+            self.tag_dirs = tag_dirs
+            self.state = None
+
+    def _is_loose_commit(self, sha):
+        """
+        Check if sha is a loose commit object by reading the object header.
+        """
+        objectPath = os.path.join(self.git_dir, "objects", sha[:2], sha[2:])
+        if not os.path.exists(objectPath):
+            return False
+        with open(objectPath, "rb") as f:
+            header = zlib.decompressobj().decompress(f.read(64))
+        return header.startswith(b"commit ")
+
+    def refresh(self):
+        """
+        Rebuild the index if the tag refs changed since the last build.
+        """
+        state_time = time.time_ns()
+        state = self._refs_state()
+        if state != self.state or self._is_racy():
+            self.state_time = state_time
+            self.build(state)
+        return self
+
+    def tag_at(self, hexsha):
+        """
+        Return the name of the tag at commit hexsha (highest version if there
+        are several) or None.
+        """
+        names = self.by_commit.get(hexsha)
+        if not names:
+            return None
+        return names[0]
+
+    def latest_tag(self):
+        """
+        Return name and commit sha of the tag with the highest version number
+        or (None, None) if there are no version tags.
+        """
+        if self.latest is None:
+            return None, None
+        return self.latest, self.tags[self.latest][0]
+
+    def __len__(self):
+        return len(self.tags)
@@ -8,10 +8,11 @@ Created on Tue Mar 19 11:17:04 2024
 import shutil
 from pathlib import Path
 import os
-import pandas as pd
-import git
 
 from . import config
+from .lazy import lazy_import
+
+git = lazy_import("git")
 
 
 def create_empty_datashelf(pathToDataself, force_new=False):
@@ -75,11 +76,12 @@ def _create_empty_datashelf(
     #     os.path.join(pathToDataself, 'mappings/country_codes.csv'),
     # )
 
-    sourcesDf = pd.DataFrame(columns=SOURCE_META_FIELDS)
+    # empty tables with header only (as written by pandas)
     filePath = os.path.join(pathToDataself, 'sources.csv')
-    sourcesDf.to_csv(filePath,  index=False)
+    with open(filePath, 'w') as f:
+        f.write(','.join(SOURCE_META_FIELDS) + '\n')
 
-    inventoryDf = pd.DataFrame(columns=INVENTORY_FIELDS)
     filePath = os.path.join(pathToDataself, 'inventory.csv')
-    inventoryDf.to_csv(filePath)
+    with open(filePath, 'w') as f:
+        f.write(',' + ','.join(INVENTORY_FIELDS) + '\n')
     git.Repo.init(pathToDataself)
\ No newline at end of file
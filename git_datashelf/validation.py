@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parallel validation of all source repositories of a datashelf
+
+@author: andreasgeiges
+"""
+import os
+import json
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config
+from .lazy import lazy_import
+
+pd = lazy_import("pandas")
+git = lazy_import("git")
+
+
+def worktree_mtime_summary(workingDir):
+    """
+    Return the number of entries and the latest modification time of the
+    work tree, skipping .git folders and nested repositories.
+    """
+    n_entries = 0
+    max_mtime = 0
+    stack = [workingDir]
+    while stack:
+        folder = stack.pop()
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.name == ".git":
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if os.path.exists(os.path.join(entry.path, ".git")):
+                        continue
+                    stack.append(entry.path)
+                stat = entry.stat(follow_symlinks=False)
+                n_entries += 1
+                max_mtime = max(max_mtime, stat.st_mtime_ns)
+    return n_entries, max_mtime
+
+
+def repository_fingerprint(repo):
+    """
+    Fingerprint of the state of a repository, consisting of the HEAD sha, the
+    stat data of the index file and a summary of the work tree modification
+    times. If the fingerprint did not change since the last clean check, the
+    repository is still clean.
+    """
+    try:
+        head = repo.head.commit.hexsha
+    except ValueError:
+        head = None
+    indexPath = os.path.join(repo.git_dir, "index")
+    if os.path.exists(indexPath):
+        stat = os.stat(indexPath)
+        index = [stat.st_mtime_ns, stat.st_size]
+    else:
+        index = None
+    return dict(
+        head=head,
+        index=index,
+        worktree=list(worktree_mtime_summary(repo.working_dir)),
+    )
+
+
+class ValidationCache:
+    """
+    Persistent manifest of repositories that were found clean, stored in the
+    .git folder of the main repository. Allows to skip the expensive dirty
+    check of repositories that were not modified since the last check.
+    """
+
+    def __init__(self, pathToDatashelf):
+        self.filePath = os.path.join(
+            pathToDatashelf, ".git", config.VALIDATION_CACHE_FILE
+        )
+        self.entries = dict()
+        if os.path.exists(self.filePath):
+            try:
+                with open(self.filePath, "r") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = dict()
+
+    def is_clean(self, sourceID, fingerprint):
+        return self.entries.get(sourceID) == fingerprint
+
+    def mark_clean(self, sourceID, fingerprint, save=True):
+        self.entries[sourceID] = fingerprint
+        if save:
+            self.save()
+
+    def invalidate(self, sourceID):
+        if self.entries.pop(sourceID, None) is not None:
+            self.save()
+
+    def save(self):
+        if not os.path.isdir(os.path.dirname(self.filePath)):
+            return
+        tmpPath = f"{self.filePath}.{os.getpid()}.tmp"
+        with open(tmpPath, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmpPath, self.filePath)
+
+
+def check_source_repository(repoPath, expected_hash, cached_fingerprint=None):
+    """
+    Check a single source repository for consistency with the datashelf.
+    This function opens the repository itself so it can run in a worker
+    process.
+
+    Parameters
+    ----------
+    repoPath : str
+        Path to the source repository.
+    expected_hash : str
+        Commit hash recorded in sources.csv.
+    cached_fingerprint : dict, optional
+        Fingerprint of the last clean check. If unchanged, the dirty check
+        is skipped.
+
+    Returns
+    -------
+    issues : list of str
+        Empty if the repository is consistent.
+    fingerprint : dict
+        Fingerprint of the repository if it is consistent, otherwise None.
+
+    """
+    if not os.path.isdir(repoPath):
+        return ["repository folder is missing"], None
+    try:
+        repo = git.Repo(repoPath)
+    except (git.InvalidGitRepositoryError, git.NoSuchPathError):
+        return ["folder is not a git repository"], None
+
+    issues = list()
+    fingerprint = repository_fingerprint(repo)
+    if fingerprint["head"] != expected_hash:
+        issues.append(
+            f"git hash {fingerprint['head']} does not match sources.csv ({expected_hash})"
+        )
+    if fingerprint != cached_fingerprint:
+        if repo.is_dirty():
+            issues.append("uncommitted modifications")
+        else:
+            # git may refresh the index during the dirty check
+            fingerprint = repository_fingerprint(repo)
+    repo.close()
+    if issues:
+        return issues, None
+    return issues, fingerprint
+
+
+class ValidationReport:
+    """
+    Collection of all inconsistencies found during a validation run.
+    """
+
+    def __init__(self):
+        self.checked = list()
+        self.issues = dict()
+
+    def add(self, sourceID, issues):
+        self.checked.append(sourceID)
+        if issues:
+            self.issues[sourceID] = list(issues)
+
+    @property
+    def is_valid(self):
+        return len(self.issues) == 0
+
+    @property
+    def clean_sources(self):
+        return [sourceID for sourceID in self.checked if sourceID not in self.issues]
+
+    def to_dataframe(self):
+        """
+        Return all issues as a table with one row per issue.
+        """
+        rows = [
+            (sourceID, issue)
+            for sourceID, issues in sorted(self.issues.items())
+            for issue in issues
+        ]
+        return pd.DataFrame(rows, columns=["source", "issue"])
+
+    def raise_if_invalid(self):
+        if not self.is_valid:
+            raise RuntimeError(str(self))
+
+    def __str__(self):
+        if self.is_valid:
+            return f"All {len(self.checked)} repositories are consistent"
+        lines = [
+            f"{len(self.issues)} of {len(self.checked)} repositories are inconsistent:"
+        ]
+        for sourceID, issues in sorted(self.issues.items()):
+            for issue in issues:
+                lines.append(f"  {sourceID}: {issue}")
+        return "\n".join(lines)
+
+    __repr__ = __str__
+
+
+def validate_sources(
+    pathToDatashelf, sources, workers=None, use_processes=False, cache=None
+):
+    """
+    Validate all sources of a datashelf using a pool of workers.
+
+    Parameters
+    ----------
+    pathToDatashelf : str
+        Path to the datashelf.
+    sources : pandas.DataFrame
+        Content of sources.csv indexed by SOURCE_ID.
+    workers : int, optional
+        Number of workers. The default is config.VALIDATION_WORKERS.
+    use_processes : bool, optional
+        Use a process pool instead of a thread pool. The default is False.
+    cache : ValidationCache, optional
+        Persistent cache of clean repositories, which is updated with the
+        results. The default is None.
+
+    Returns
+    -------
+    report : ValidationReport
+
+    """
+    if workers is None:
+        workers = config.VALIDATION_WORKERS
+
+    databasePath = os.path.join(pathToDatashelf, "database")
+    sourceIDs = list(sources.index)
+
+    report = ValidationReport()
+    if use_processes:
+        from concurrent.futures import ProcessPoolExecutor as Executor
+    else:
+        Executor = ThreadPoolExecutor
+    with Executor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                check_source_repository,
+                os.path.join(databasePath, sourceID),
+                sources.loc[sourceID, "git_commit_hash"],
+                cache.entries.get(sourceID) if cache is not None else None,
+            )
+            for sourceID in sourceIDs
+        ]
+        for sourceID, future in zip(sourceIDs, futures):
+            try:
+                issues, fingerprint = future.result()
+            except Exception as e:
+                issues, fingerprint = [f"validation failed: {e}"], None
+            report.add(sourceID, issues)
+            if cache is not None:
+                if fingerprint is None:
+                    cache.entries.pop(sourceID, None)
+                else:
+                    cache.mark_clean(sourceID, fingerprint, save=False)
+    if cache is not None:
+        cache.save()
+
+    # folders in the database that are not registered in sources.csv
+    if os.path.isdir(databasePath):
+        for folder in sorted(os.listdir(databasePath)):
+            if folder not in sources.index and os.path.isdir(
+                os.path.join(databasePath, folder)
+            ):
+                report.add(folder, ["repository not registered in sources.csv"])
+
+    return report
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memory bounded LRU cache of tables and inventories materialized from older
+versions of the sources
+
+Entries are keyed by the resolved commit sha, so a cached version is valid
+until the cache evicts it. The size of an entry is the deep memory usage of
+the DataFrame.
+
+@author: andreasgeiges
+"""
+import threading
+
+from collections import OrderedDict
+
+from . import config
+
+
+def memory_size(table):
+    """
+    Return the deep memory usage of a DataFrame in bytes.
+    """
+    return int(table.memory_usage(index=True, deep=True).sum())
+
+
+class VersionCache:
+    """
+    LRU cache with a limit of the total memory of the cached DataFrames.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        The default is config.VERSION_CACHE_MAX_BYTES.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = config.VERSION_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached DataFrame of key or None.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, table):
+        """
+        Cache a DataFrame. Tables larger than max_bytes are not cached.
+        """
+        nbytes = memory_size(table)
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return
+            while self.entries and self.size + nbytes > self.max_bytes:
+                _, (_, evicted_bytes) = self.entries.popitem(last=False)
+                self.size -= evicted_bytes
+                self.evictions += 1
+            self.entries[key] = (table, nbytes)
+            self.size += nbytes
+
+    def get_or_load(self, key, load):
+        """
+        Return the cached DataFrame of key or load, cache and return it.
+        """
+        table = self.get(key)
+        if table is None:
+            table = load()
+            self.put(key, table)
+        return table
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        Return the hit/miss statistics and the memory usage of the cache.
+        """
+        with self.lock:
+            requests = self.hits + self.misses
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                hit_rate=self.hits / requests if requests else 0.0,
+                evictions=self.evictions,
+                items=len(self.entries),
+                bytes=self.size,
+                max_bytes=self.max_bytes,
+            )
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+inotify based tracking of modified files in the source work trees (Linux only)
+
+The watcher keeps, per source, the set of paths that were modified since the
+source was found clean. Re-validating a source then only requires to check
+these paths instead of a full work tree scan. inotify is accessed through
+ctypes, no additional dependency is required.
+
+@author: andreasgeiges
+"""
+import ctypes
+import ctypes.util
+import functools
+import os
+import select
+import struct
+import sys
+import threading
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+@functools.lru_cache(maxsize=None)
+def _load_libc():
+    # loaded on first use, find_library may start a subprocess
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def inotify_available():
+    return _load_libc() is not None
+
+
+class WorktreeWatcher:
+    """
+    Watches the work trees of sources and collects the modified paths.
+
+    changes[sourceID] is the set of paths relative to the work tree that were
+    modified since watch() or clear() was called for the source, or None if
+    the modifications are unknown (e.g. after an event queue overflow).
+    """
+
+    def __init__(self):
+        self.libc = _load_libc()
+        if self.libc is None:
+            raise RuntimeError("inotify is not available on this platform")
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        self.lock = threading.Lock()
+        self.watches = dict()
+        self.roots = dict()
+        self.changes = dict()
+
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    #%% Watches
+    def _add_watch(self, sourceID, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            # e.g. too many watches, fall back to unknown modifications
+            self.changes[sourceID] = None
+            return
+        self.watches[wd] = (sourceID, path)
+
+    def _add_tree(self, sourceID, root):
+        for folder, dirs, files in os.walk(root):
+            dirs[:] = [name for name in dirs if name != ".git"]
+            self._add_watch(sourceID, folder)
+
+    def watch(self, sourceID, root):
+        """
+        Start watching the work tree of a source and reset its modifications.
+        """
+        with self.lock:
+            if sourceID not in self.roots:
+                self.roots[sourceID] = root
+                self._add_tree(sourceID, root)
+            self.changes[sourceID] = set()
+
+    def unwatch(self, sourceID):
+        with self.lock:
+            for wd, (watchedID, path) in list(self.watches.items()):
+                if watchedID == sourceID:
+                    self.libc.inotify_rm_watch(self.fd, wd)
+                    del self.watches[wd]
+            self.roots.pop(sourceID, None)
+            self.changes.pop(sourceID, None)
+
+    def is_watched(self, sourceID):
+        return sourceID in self.roots
+
+    def get_changes(self, sourceID):
+        """
+        Return a copy of the modified paths of a source (None if unknown).
+        """
+        self.drain()
+        with self.lock:
+            changes = self.changes.get(sourceID)
+            return None if changes is None else set(changes)
+
+    def clear(self, sourceID, paths=None):
+        """
+        Mark all or the given paths of a source as checked.
+        """
+        with self.lock:
+            if paths is None or self.changes.get(sourceID) is None:
+                self.changes[sourceID] = set()
+            else:
+                self.changes[sourceID].difference_update(paths)
+
+    #%% Events
+    def _handle_events(self, data):
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                for sourceID in self.roots:
+                    self.changes[sourceID] = None
+                continue
+            if wd not in self.watches:
+                continue
+            sourceID, folder = self.watches[wd]
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                continue
+
+            path = os.path.join(folder, os.fsdecode(name)) if name else folder
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_tree(sourceID, path)
+            if self.changes.get(sourceID) is not None:
+                relPath = os.path.relpath(path, self.roots[sourceID])
+                if relPath != ".":
+                    self.changes[sourceID].add(relPath)
+
+    def drain(self):
+        """
+        Process all pending events.
+        """
+        with self.lock:
+            while True:
+                try:
+                    data = os.read(self.fd, 65536)
+                except BlockingIOError:
+                    break
+                if not data:
+                    break
+                self._handle_events(data)
+
+    def _run(self):
+        while not self._stop:
+            try:
+                readable, _, _ = select.select([self.fd], [], [], 0.5)
+            except (OSError, ValueError):
+                break
+            if readable and not self._stop:
+                self.drain()
+
+    def close(self):
+        self._stop = True
+        self._thread.join()
+        os.close(self.fd)
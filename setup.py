@@ -52,6 +52,9 @@ def main():
             "openpyxl",
             "tabulate",        
             "deprecated",],
+        "extras_require": {
+            "parquet": ["pyarrow"],
+            },
         }
     rtn = setup(**setup_kwargs)
 
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared fixtures to build small synthetic datashelves
+"""
+import os
+import git
+import pandas as pd
+import pytest
+
+from git_datashelf import config, create_empty_datashelf, GitRepository_Manager
+
+
+def source_meta(sourceID):
+    return dict(
+        SOURCE_ID=sourceID,
+        collected_by='tester',
+        date='2024/03/19',
+        source_url='https://example.org/' + sourceID,
+        licence='CC-BY',
+    )
+
+
+@pytest.fixture
+def datashelf(tmp_path, monkeypatch):
+    """
+    Empty datashelf with two committed sources. Returns the path to the shelf.
+    """
+    shelf = str(tmp_path / 'datashelf')
+    create_empty_datashelf(shelf)
+
+    for variable in ['GIT_AUTHOR_NAME', 'GIT_COMMITTER_NAME']:
+        monkeypatch.setenv(variable, 'tester')
+    for variable in ['GIT_AUTHOR_EMAIL', 'GIT_COMMITTER_EMAIL']:
+        monkeypatch.setenv(variable, 'tester@example.org')
+    monkeypatch.setattr(config, 'CRUNCHER', 'tester', raising=False)
+    monkeypatch.setattr(config, 'SOURCE_SUB_FOLDERS', ['tables', 'raw_data'], raising=False)
+
+    manager = GitRepository_Manager(shelf)
+    for sourceID in ['SOURCE_A_2020', 'SOURCE_B_2021']:
+        manager.init_new_repo(
+            os.path.join(shelf, 'database', sourceID), sourceID, source_meta(sourceID)
+        )
+    return shelf
+
+
+@pytest.fixture
+def remote_datashelf(datashelf, tmp_path, monkeypatch):
+    """
+    Datashelf whose sources and remote_sources are pushed to local bare
+    repositories standing in for config.DATASHELF_REMOTE.
+    """
+    remote = tmp_path / 'remote'
+    remote.mkdir()
+    monkeypatch.setattr(config, 'DATASHELF_REMOTE', str(remote) + os.sep, raising=False)
+    monkeypatch.setattr(config, 'DATASHELF_REMOTE_HTTPS', str(remote) + os.sep, raising=False)
+
+    states = ['SOURCE_ID,git_commit_hash,tag,last_to_update']
+    for sourceID in sorted(os.listdir(os.path.join(datashelf, 'database'))):
+        repo = git.Repo(os.path.join(datashelf, 'database', sourceID))
+        repo.create_tag('v1.0')
+        push_to_new_remote(repo, remote / (sourceID + '.git'))
+        states.append(f'{sourceID},{repo.head.commit.hexsha},v1.0,tester')
+
+    work = tmp_path / 'remote_sources_work'
+    work.mkdir()
+    repo = git.Repo.init(work)
+    with open(work / 'source_states.csv', 'w') as f:
+        f.write('\n'.join(states) + '\n')
+    repo.index.add(['source_states.csv'])
+    repo.index.commit('initial source states')
+    push_to_new_remote(repo, remote / 'remote_sources.git')
+    return datashelf
+
+
+def push_to_new_remote(repo, remotePath):
+    git.Repo.init(remotePath, bare=True)
+    origin = repo.create_remote('origin', str(remotePath))
+    branch = repo.active_branch
+    origin.push(branch, tags=True)
+    origin.fetch()
+    branch.set_tracking_branch(origin.refs[branch.name])
+    return origin
+
+
+def push_remote_commit(tmp_path, remotePath, fileName, content):
+    """
+    Commit a new file to a remote repository from a separate clone.
+    """
+    clonePath = tmp_path / ('clone_' + os.path.basename(str(remotePath)))
+    if clonePath.exists():
+        repo = git.Repo(clonePath)
+        repo.remote('origin').pull()
+    else:
+        repo = git.Repo.clone_from(str(remotePath), clonePath)
+    filePath = clonePath / fileName
+    filePath.parent.mkdir(parents=True, exist_ok=True)
+    with open(filePath, 'w') as f:
+        f.write(content)
+    repo.index.add([str(filePath)])
+    commit = repo.index.commit('remote update of ' + fileName)
+    repo.remote('origin').push()
+    return commit
+
+
+def write_inventory(datashelf, sourceID, variables):
+    inventory = pd.DataFrame(
+        [
+            dict(variable=variable, entity='DEU', source=sourceID, source_year='2020')
+            for variable in variables
+        ],
+        columns=config.INVENTORY_FIELDS,
+        index=[f'{sourceID}__{i}' for i in range(len(variables))],
+    )
+    folder = os.path.join(datashelf, 'database', sourceID)
+    os.makedirs(folder, exist_ok=True)
+    filePath = os.path.join(folder, 'source_inventory.csv')
+    inventory.to_csv(filePath)
+    return filePath
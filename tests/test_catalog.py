@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the cached remote source catalog
+"""
+import os
+import git
+import pytest
+
+from git_datashelf.catalog import RemoteCatalog
+
+
+def _commit_states(repo, rows):
+    with open(os.path.join(repo.working_dir, 'source_states.csv'), 'w') as f:
+        f.write('SOURCE_ID,git_commit_hash,tag,last_to_update\n')
+        for row in rows:
+            f.write(','.join(row) + '\n')
+    repo.index.add(['source_states.csv'])
+    repo.index.commit('update source states')
+
+
+def test_remote_catalog_applies_diff(tmp_path, monkeypatch):
+
+    os.mkdir(tmp_path / '.git')
+    repo = git.Repo.init(tmp_path / 'remote_sources')
+    _commit_states(repo, [('A_2020', 'aaa', 'v1.0', 'x'), ('B_2021', 'bbb', 'v2.0', 'y')])
+
+    catalog = RemoteCatalog(str(tmp_path / 'remote_sources'))
+    assert list(catalog.load().index) == ['A_2020', 'B_2021']
+    assert list(catalog.versions) == [1.0, 2.0]
+
+    _commit_states(
+        repo,
+        [('B_2021', 'ccc', 'v10.0', 'y'), ('C_2022', 'ddd', 'v1.0', '')],
+    )
+
+    # a new catalog instance starts from the cache and only applies the diff
+    catalog = RemoteCatalog(str(tmp_path / 'remote_sources'))
+    monkeypatch.setattr(RemoteCatalog, '_read_rows', lambda self, f: pytest.fail('full parse'))
+    table = catalog.load()
+    assert sorted(table.index) == ['B_2021', 'C_2022']
+    assert table.loc['B_2021', 'git_commit_hash'] == 'ccc'
+    assert table['last_to_update'].isna()['C_2022']
+    assert catalog.versions['B_2021'] == 10.0
+
+
+def test_remote_catalog_reparses_after_uncommitted_edit(tmp_path):
+
+    os.mkdir(tmp_path / '.git')
+    repo = git.Repo.init(tmp_path / 'remote_sources')
+    _commit_states(repo, [('A_2020', 'aaa', 'v1.0', 'x')])
+    statesFile = os.path.join(repo.working_dir, 'source_states.csv')
+
+    catalog = RemoteCatalog(str(tmp_path / 'remote_sources'))
+    catalog.load()
+    with open(statesFile, 'w') as f:
+        f.write('SOURCE_ID,git_commit_hash,tag,last_to_update\nA_2020,zzz,v9.0,x\n')
+    assert catalog.load().loc['A_2020', 'git_commit_hash'] == 'zzz'
+
+    # reverting the edit and committing on top must not keep the edited rows
+    repo.git.checkout('--', 'source_states.csv')
+    assert catalog.load().loc['A_2020', 'git_commit_hash'] == 'aaa'
+    _commit_states(repo, [('A_2020', 'aaa', 'v1.0', 'x'), ('B_2021', 'bbb', 'v2.0', 'y')])
+    table = RemoteCatalog(str(tmp_path / 'remote_sources')).load()
+    assert table.loc['A_2020', 'tag'] == 'v1.0'
+    assert sorted(table.index) == ['A_2020', 'B_2021']
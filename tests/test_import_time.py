@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Regression tests of the import and startup time of git_datashelf
+"""
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ['pandas', 'numpy', 'git', 'tabulate', 'tqdm', 'pyarrow']
+
+# generous budgets in seconds, the loaded modules are the main check
+IMPORT_BUDGET = 0.5
+READ_ONLY_BUDGET = 1.0
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import git_datashelf
+import_time = time.perf_counter() - start
+{code}
+total_time = time.perf_counter() - start
+loaded = [name for name in {modules!r} if name in sys.modules]
+print(json.dumps(dict(import_time=import_time, total_time=total_time, loaded=loaded)))
+"""
+
+
+def _run(code=''):
+    output = subprocess.run(
+        [sys.executable, '-c', SCRIPT.format(code=code, modules=HEAVY_MODULES)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_import_time():
+
+    result = _run()
+    assert result['loaded'] == []
+    assert result['import_time'] < IMPORT_BUDGET
+
+
+def test_read_only_startup_time(datashelf):
+
+    result = _run(
+        f"manager = git_datashelf.GitRepository_Manager({datashelf!r}, read_only=True)\n"
+        "manager.get_hash_of_source('SOURCE_A_2020')"
+    )
+    assert result['loaded'] == []
+    assert result['total_time'] < READ_ONLY_BUDGET
+
+
+def test_create_empty_datashelf_time(tmp_path):
+
+    result = _run(f"git_datashelf.create_empty_datashelf({str(tmp_path / 'shelf')!r})")
+    assert 'pandas' not in result['loaded']
+    assert result['total_time'] < IMPORT_BUDGET + READ_ONLY_BUDGET
+
+
+def test_cold_parallel_validation(datashelf):
+
+    # the first access of the lazily imported modules happens in the workers
+    result = _run(
+        f"manager = git_datashelf.GitRepository_Manager({datashelf!r}, read_only=True)\n"
+        "assert manager.validate_all_sources(workers=8).is_valid"
+    )
+    assert 'git' in result['loaded']
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the consolidated inventory
+"""
+import asyncio
+import pandas as pd
+import pytest
+
+from git_datashelf import GitRepository_Manager
+from git_datashelf.inventory import HAS_PARQUET
+from conftest import push_remote_commit, write_inventory
+
+
+@pytest.mark.skipif(not HAS_PARQUET, reason='the partition cache requires pyarrow')
+def test_inventory_engine(datashelf):
+
+    manager = GitRepository_Manager(datashelf)
+    manager.gitAddFile('SOURCE_A_2020', write_inventory(datashelf, 'SOURCE_A_2020', ['GDP', 'Population']))
+    manager.gitAddFile('SOURCE_B_2021', write_inventory(datashelf, 'SOURCE_B_2021', ['GDP']))
+    manager.commit('add inventories')
+
+    engine = manager.get_inventory_engine()
+    assert len(engine.table) == 3
+    assert isinstance(engine.table['variable'].dtype, pd.CategoricalDtype)
+    assert engine.sources_providing(variable='GDP') == ['SOURCE_A_2020', 'SOURCE_B_2021']
+    assert len(engine.query(variable=['GDP', 'Population'], source='SOURCE_A_2020')) == 2
+    assert len(engine.query(variable='Unknown')) == 0
+
+    # only changed sources are rebuilt
+    manager.gitAddFile('SOURCE_B_2021', write_inventory(datashelf, 'SOURCE_B_2021', ['Emissions']))
+    manager.commit('update inventory')
+    engine = GitRepository_Manager(datashelf).get_inventory_engine(update=False)
+    assert engine.update(manager.sources) == ['SOURCE_B_2021']
+    assert engine.sources_providing(variable='GDP') == ['SOURCE_A_2020']
+
+
+def test_pull_updates_from_remote_swaps_partitions(remote_datashelf, tmp_path):
+
+    inventories = dict()
+    for sourceID, variables in [('SOURCE_A_2020', ['GDP']), ('SOURCE_B_2021', ['Population'])]:
+        inventory = pd.read_csv(write_inventory(tmp_path, sourceID, variables), index_col=0)
+        inventories[sourceID] = inventory
+        push_remote_commit(
+            tmp_path,
+            tmp_path / 'remote' / (sourceID + '.git'),
+            'source_inventory.csv',
+            inventory.to_csv(),
+        )
+
+    manager = GitRepository_Manager(remote_datashelf)
+    inventory = manager.pull_updates_from_remote(['SOURCE_A_2020', 'SOURCE_B_2021'])
+    assert sorted(inventory['variable']) == ['GDP', 'Population']
+    for sourceID in inventories:
+        assert manager.sources.loc[sourceID, 'git_commit_hash'] == manager[sourceID].head.commit.hexsha
+
+
+def test_pull_subset_keeps_other_sources(remote_datashelf, tmp_path):
+
+    manager = GitRepository_Manager(remote_datashelf)
+    manager.gitAddFile('SOURCE_B_2021', write_inventory(remote_datashelf, 'SOURCE_B_2021', ['Population']))
+    manager.commit('add inventory')
+
+    inventory = pd.read_csv(write_inventory(tmp_path, 'SOURCE_A_2020', ['GDP']), index_col=0)
+    push_remote_commit(
+        tmp_path,
+        tmp_path / 'remote' / 'SOURCE_A_2020.git',
+        'source_inventory.csv',
+        inventory.to_csv(),
+    )
+
+    # cold engine: the inventory of the source that is not pulled is kept
+    manager = GitRepository_Manager(remote_datashelf)
+    inventory = manager.pull_updates_from_remote(['SOURCE_A_2020'])
+    assert sorted(inventory['variable']) == ['GDP', 'Population']
+
+
+def test_pull_many_and_single_pull_keep_other_sources(remote_datashelf, tmp_path):
+
+    manager = GitRepository_Manager(remote_datashelf)
+    manager.gitAddFile('SOURCE_B_2021', write_inventory(remote_datashelf, 'SOURCE_B_2021', ['Population']))
+    manager.commit('add inventory')
+
+    def push_inventory(variables):
+        inventory = pd.read_csv(write_inventory(tmp_path, 'SOURCE_A_2020', variables), index_col=0)
+        push_remote_commit(
+            tmp_path,
+            tmp_path / 'remote' / 'SOURCE_A_2020.git',
+            'source_inventory.csv',
+            inventory.to_csv(),
+        )
+
+    push_inventory(['GDP'])
+    manager = GitRepository_Manager(remote_datashelf)
+    inventory = asyncio.run(manager.pull_many(['SOURCE_A_2020']))
+    assert sorted(inventory['variable']) == ['GDP', 'Population']
+
+    push_inventory(['Emissions'])
+    manager.inventoryEngine = None
+    inventory = manager.pull_update_from_remote('SOURCE_A_2020')
+    assert isinstance(inventory, pd.DataFrame)
+    assert sorted(inventory['variable']) == ['Emissions', 'Population']
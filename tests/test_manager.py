@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the GitRepository_Manager on a small synthetic datashelf
+"""
+import multiprocessing
+import os
+import warnings
+import git
+import pandas as pd
+import pytest
+
+from git_datashelf import config, GitRepository_Manager
+from git_datashelf.tables import HAS_ARROW
+from git_datashelf.watcher import inotify_available
+from conftest import write_inventory
+
+
+def test_lazy_manager_opens_repos_on_demand(datashelf):
+
+    manager = GitRepository_Manager(datashelf, lazy=True)
+    assert set(manager.repositories.keys()) == {'main'}
+
+    hexsha = manager.get_hash_of_source('SOURCE_A_2020')
+    assert hexsha == manager.sources.loc['SOURCE_A_2020', 'git_commit_hash']
+    assert set(manager.repositories.keys()) == {'main', 'SOURCE_A_2020'}
+
+    with pytest.raises(KeyError):
+        manager['UNKNOWN_SOURCE']
+
+
+def test_lazy_manager_verifies_hash(datashelf):
+
+    repo = git.Repo(os.path.join(datashelf, 'database', 'SOURCE_B_2021'))
+    repo.index.commit('commit outside of the manager')
+
+    manager = GitRepository_Manager(datashelf, lazy=True)
+    with pytest.raises(RuntimeError):
+        manager['SOURCE_B_2021']
+    assert 'SOURCE_B_2021' not in manager.repositories
+
+
+def test_validate_all_sources_collects_all_issues(datashelf):
+
+    manager = GitRepository_Manager(datashelf, lazy=True)
+    report = manager.validate_all_sources(workers=2)
+    assert report.is_valid
+    assert set(report.checked) == {'SOURCE_A_2020', 'SOURCE_B_2021'}
+
+    with open(os.path.join(datashelf, 'database', 'SOURCE_A_2020', 'meta.csv'), 'a') as f:
+        f.write('extra,line\n')
+    repo = git.Repo(os.path.join(datashelf, 'database', 'SOURCE_B_2021'))
+    repo.index.commit('commit outside of the manager')
+    os.mkdir(os.path.join(datashelf, 'database', 'UNREGISTERED'))
+
+    report = manager.validate_all_sources(workers=2)
+    assert set(report.issues) == {'SOURCE_A_2020', 'SOURCE_B_2021', 'UNREGISTERED'}
+    assert len(report.to_dataframe()) == 3
+    with pytest.raises(RuntimeError):
+        report.raise_if_invalid()
+
+
+def test_persistent_validation_cache(datashelf, monkeypatch):
+
+    manager = GitRepository_Manager(datashelf)
+    manager['SOURCE_A_2020']
+
+    # warm start: unchanged repositories are not checked again
+    def fail(self, *args, **kwargs):
+        raise AssertionError('is_dirty should not be called')
+
+    with monkeypatch.context() as m:
+        m.setattr(git.Repo, 'is_dirty', fail)
+        manager = GitRepository_Manager(datashelf)
+        manager['SOURCE_A_2020']
+
+    # a modification invalidates the cached state
+    with open(os.path.join(datashelf, 'database', 'SOURCE_A_2020', 'meta.csv'), 'a') as f:
+        f.write('extra,line\n')
+    manager = GitRepository_Manager(datashelf)
+    with pytest.raises(RuntimeError):
+        manager['SOURCE_A_2020']
+
+
+def _write_table(datashelf, sourceID, fileName='data.csv', content='region,2020\nDEU,1\n'):
+    filePath = os.path.join(datashelf, 'database', sourceID, 'tables', fileName)
+    with open(filePath, 'w') as f:
+        f.write(content)
+    return filePath
+
+
+def test_commit_multiple_sources(datashelf):
+
+    manager = GitRepository_Manager(datashelf)
+    for sourceID in ['SOURCE_A_2020', 'SOURCE_B_2021']:
+        manager.gitAddFile(sourceID, _write_table(datashelf, sourceID))
+    manager.commit('add tables')
+
+    for sourceID in ['SOURCE_A_2020', 'SOURCE_B_2021']:
+        repo = git.Repo(os.path.join(datashelf, 'database', sourceID))
+        assert repo.head.commit.hexsha == manager.sources.loc[sourceID, 'git_commit_hash']
+    GitRepository_Manager(datashelf).validate_all_sources(raise_on_error=True)
+
+
+def test_commit_failure_is_atomic(datashelf):
+
+    manager = GitRepository_Manager(datashelf)
+    previous_hashes = manager.sources['git_commit_hash'].copy()
+    manager.gitAddFile('SOURCE_A_2020', _write_table(datashelf, 'SOURCE_A_2020'))
+    manager.gitAddFile('SOURCE_B_2021', os.path.join(datashelf, 'database', 'SOURCE_B_2021', 'missing.csv'))
+
+    with pytest.raises(RuntimeError, match='SOURCE_B_2021'):
+        manager.commit('add tables')
+
+    for sourceID in ['SOURCE_A_2020', 'SOURCE_B_2021']:
+        repo = git.Repo(os.path.join(datashelf, 'database', sourceID))
+        assert repo.head.commit.hexsha == previous_hashes[sourceID]
+    assert 'SOURCE_A_2020' in manager.updatedRepos
+
+
+def test_read_table_at_version(datashelf):
+
+    manager = GitRepository_Manager(datashelf)
+    repo = manager['SOURCE_A_2020']
+    manager.gitAddFile('SOURCE_A_2020', _write_table(datashelf, 'SOURCE_A_2020', content='region,2020\nDEU,1\n'))
+    manager.commit('first version')
+    repo.create_tag('v1.0')
+    first = repo.head.commit.hexsha
+    manager.gitAddFile('SOURCE_A_2020', _write_table(datashelf, 'SOURCE_A_2020', content='region,2020\nDEU,2\n'))
+    manager.commit('second version')
+
+    assert manager.read_table('SOURCE_A_2020', 'tables/data.csv', version='v1.0').loc[0, '2020'] == 1
+    assert manager.read_table('SOURCE_A_2020', 'tables/data.csv', version=first).loc[0, '2020'] == 1
+    assert manager.read_table('SOURCE_A_2020', 'tables/data.csv').loc[0, '2020'] == 2
+    assert repo.head.commit.hexsha != first
+
+    with pytest.raises(FileNotFoundError):
+        manager.read_file('SOURCE_A_2020', 'tables/missing.csv')
+    with pytest.raises(KeyError):
+        manager.read_file('SOURCE_A_2020', 'tables/data.csv', version='v9.0')
+
+
+def test_instrumentation(datashelf):
+
+    manager = GitRepository_Manager(datashelf)
+    assert manager.instrumentation.span('is_dirty') is manager.instrumentation.span('commit')
+
+    manager.instrumentation.enable()
+    manager.gitAddFile('SOURCE_A_2020', _write_table(datashelf, 'SOURCE_A_2020'))
+    manager.commit('add table')
+
+    stats = manager.instrumentation.stats()
+    for operation in ['index_add', 'index_commit', 'write_sources_csv']:
+        assert stats.loc[operation, 'count'] >= 1
+    assert list(stats.columns) == ['count', 'total', 'mean', 'p95', 'max']
+    by_source = manager.instrumentation.stats(by_source=True)
+    assert ('index_commit', 'SOURCE_A_2020') in by_source.index
+
+
+@pytest.mark.skipif(not inotify_available(), reason='requires inotify')
+def test_watcher_tracks_worktree_changes(datashelf, monkeypatch):
+
+    # the clean state of the sources is in the persistent validation cache
+    GitRepository_Manager(datashelf).validate_all_sources(raise_on_error=True)
+    manager = GitRepository_Manager(datashelf, watch=True)
+    try:
+        manager['SOURCE_A_2020']
+        assert manager.watcher.is_watched('SOURCE_A_2020')
+
+        # modifications through the manager do not warn
+        filePath = _write_table(datashelf, 'SOURCE_A_2020')
+        manager.gitAddFile('SOURCE_A_2020', filePath)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            manager['SOURCE_A_2020']
+        manager.commit('add table')
+
+        # re-validation only checks the modified paths
+        manager.validatedRepos.discard('SOURCE_A_2020')
+        with monkeypatch.context() as m:
+            m.setattr(git.Repo, 'is_dirty', lambda self, *args, **kwargs: 1 / 0)
+            manager['SOURCE_A_2020']
+
+        with open(os.path.join(datashelf, 'database', 'SOURCE_A_2020', 'meta.csv'), 'a') as f:
+            f.write('extra,line\n')
+        assert manager.check_worktree_changes()['SOURCE_A_2020'] == {'meta.csv'}
+        with pytest.warns(UserWarning, match='modified outside of the manager'):
+            manager['SOURCE_A_2020']
+    finally:
+        manager.stop_watcher()
+
+
+@pytest.mark.skipif(not inotify_available(), reason='requires inotify')
+def test_watcher_keeps_dirty_source_invalid(datashelf):
+
+    with open(os.path.join(datashelf, 'database', 'SOURCE_B_2021', 'meta.csv'), 'a') as f:
+        f.write('extra,line\n')
+    manager = GitRepository_Manager(datashelf, watch=True)
+    try:
+        for _ in range(2):
+            with pytest.raises(RuntimeError, match='inconsistent'):
+                manager['SOURCE_B_2021']
+    finally:
+        manager.stop_watcher()
+
+
+def _commit_table_in_process(datashelf, sourceID, n_commits):
+    manager = GitRepository_Manager(datashelf, lazy=True)
+    for i in range(n_commits):
+        manager.gitAddFile(sourceID, _write_table(datashelf, sourceID, content=f'region,2020\nDEU,{i}\n'))
+        manager.commit(f'update {sourceID}')
+
+
+def test_concurrent_commits_of_processes(datashelf):
+
+    context = multiprocessing.get_context('fork')
+    processes = [
+        context.Process(target=_commit_table_in_process, args=(datashelf, sourceID, 3))
+        for sourceID in ['SOURCE_A_2020', 'SOURCE_B_2021']
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+
+    manager = GitRepository_Manager(datashelf)
+    for sourceID in ['SOURCE_A_2020', 'SOURCE_B_2021']:
+        repo = git.Repo(os.path.join(datashelf, 'database', sourceID))
+        assert repo.head.commit.hexsha == manager.sources.loc[sourceID, 'git_commit_hash']
+    assert not manager['main'].is_dirty()
+    manager.validate_all_sources(raise_on_error=True)
+
+
+def test_read_only_snapshot(datashelf, monkeypatch):
+
+    writer = GitRepository_Manager(datashelf)
+    writer.gitAddFile('SOURCE_A_2020', _write_table(datashelf, 'SOURCE_A_2020'))
+    writer.commit('add table')
+
+    reader = GitRepository_Manager(datashelf, read_only=True)
+    assert reader.snapshot == writer['main'].head.commit.hexsha
+
+    # later commits and uncommitted modifications do not affect the snapshot
+    writer.gitAddFile(
+        'SOURCE_A_2020', _write_table(datashelf, 'SOURCE_A_2020', content='region,2020\nDEU,2\n')
+    )
+    writer.commit('update table')
+    with open(os.path.join(datashelf, 'database', 'SOURCE_A_2020', 'meta.csv'), 'a') as f:
+        f.write('extra,line\n')
+
+    table = reader.read_table('SOURCE_A_2020', 'tables/data.csv')
+    assert table.loc[0, '2020'] == 1
+    assert reader.get_hash_of_source('SOURCE_A_2020') != writer.registry.get('SOURCE_A_2020', 'git_commit_hash')
+    reader['SOURCE_A_2020']
+    with pytest.raises(RuntimeError):
+        reader.gitAddFile('SOURCE_A_2020', 'tables/data.csv')
+
+    monkeypatch.setattr(config, 'DB_READ_ONLY', True)
+    assert GitRepository_Manager(datashelf).read_table('SOURCE_A_2020', 'tables/data.csv').loc[0, '2020'] == 2
+
+
+def test_read_only_inventory_engine(datashelf):
+
+    writer = GitRepository_Manager(datashelf)
+    writer.gitAddFile('SOURCE_A_2020', write_inventory(datashelf, 'SOURCE_A_2020', ['v']))
+    writer.commit('add inventory')
+    reader = GitRepository_Manager(datashelf, read_only=True)
+
+    writer.gitAddFile('SOURCE_A_2020', write_inventory(datashelf, 'SOURCE_A_2020', ['NEW']))
+    writer.commit('update inventory')
+
+    # the snapshot inventory is read at the pinned commit and not cached
+    cacheDir = os.path.join(datashelf, '.git', config.INVENTORY_CACHE_DIR)
+    assert list(reader.get_inventory_engine().table['variable']) == ['v']
+    assert not os.path.exists(cacheDir)
+    assert list(writer.get_inventory_engine().table['variable']) == ['NEW']
+
+
+@pytest.mark.skipif(not HAS_ARROW, reason='requires pyarrow')
+def test_chunked_table(datashelf):
+
+    manager = GitRepository_Manager(datashelf)
+    table = pd.DataFrame(
+        {
+            'region': ['DEU', 'DEU', 'FRA', 'USA'],
+            'year': [2020, 2021, 2020, 2020],
+            'value': [1.0, 2.0, 3.0, 4.0],
+        }
+    )
+    manager.write_table('SOURCE_A_2020', 'tables/emissions', table, chunk_by=['region'])
+    manager.commit('add chunked table')
+    first = manager.get_hash_of_source('SOURCE_A_2020')
+
+    # only the modified chunk is written and committed
+    table.loc[2, 'value'] = 30.0
+    written = manager.write_table('SOURCE_A_2020', 'tables/emissions', table, chunk_by=['region'])
+    assert [os.path.basename(path) for path in written] == ['region=FRA.parquet']
+    manager.commit('update FRA')
+    repo = manager['SOURCE_A_2020']
+    assert list(repo.head.commit.stats.files) == ['tables/emissions/region=FRA.parquet']
+
+    loaded = manager.read_table(
+        'SOURCE_A_2020',
+        'tables/emissions',
+        columns=['value'],
+        filters=[('region', 'in', ['DEU', 'FRA']), ('year', '==', 2020)],
+    )
+    assert list(loaded.columns) == ['value']
+    assert list(loaded['value']) == [1.0, 30.0]
+    old = manager.read_table('SOURCE_A_2020', 'tables/emissions', version=first)
+    assert old.loc[old.region == 'FRA', 'value'].item() == 3.0
+
+    # removed chunks are removed from the repository
+    manager.write_table('SOURCE_A_2020', 'tables/emissions', table[table.region != 'USA'], chunk_by=['region'])
+    manager.commit('remove USA')
+    assert 'tables/emissions/region=USA.parquet' not in [
+        blob.path for blob in repo.head.commit.tree.traverse()
+    ]
+    manager.validate_all_sources(raise_on_error=True)
+
+
+def test_history_and_changed_paths(datashelf):
+
+    manager = GitRepository_Manager(datashelf)
+    manager.gitAddFile('SOURCE_A_2020', _write_table(datashelf, 'SOURCE_A_2020'))
+    manager.gitAddFile('SOURCE_A_2020', _write_table(datashelf, 'SOURCE_A_2020', 'other.csv'))
+    manager.commit('add tables')
+    manager['SOURCE_A_2020'].create_tag('v1.0')
+    main_commit = manager['main'].head.commit.hexsha
+
+    manager.gitAddFile(
+        'SOURCE_A_2020', _write_table(datashelf, 'SOURCE_A_2020', content='region,2020\nDEU,2\n')
+    )
+    manager.commit('update table')
+
+    history = manager.history('SOURCE_A_2020')
+    assert [message.split(' by ')[0] for message in history['message'][:2]] == ['update table', 'add tables']
+    assert history['tags'].iloc[1] == ['v1.0']
+    assert len(manager.history('SOURCE_A_2020', paths=['tables/other.csv'])) == 1
+
+    commits, changes = manager.changed_since('SOURCE_A_2020', 'v1.0')
+    assert changes.values.tolist() == [['modified', 'tables/data.csv']]
+    assert [message.split(' by ')[0] for message in commits['message']] == ['update table']
+    manager['SOURCE_A_2020'].create_tag('v1.1')
+    commits, _ = manager.changed_since('SOURCE_A_2020', history.index[-1], 'v1.1')
+    assert commits['tags'].tolist() == [['v1.1'], ['v1.0']]
+
+    changes = manager.changed_sources(main_commit)
+    assert changes[['SOURCE_ID', 'change', 'status', 'path']].values.tolist() == [
+        ['SOURCE_A_2020', 'modified', 'modified', 'tables/data.csv']
+    ]
+    assert changes['new_hash'].item() == manager.get_hash_of_source('SOURCE_A_2020')
+    assert len(manager.changed_sources('HEAD', 'HEAD')) == 0
+
+
+def test_run_maintenance(datashelf, monkeypatch):
+
+    manager = GitRepository_Manager(datashelf)
+    report = manager.run_maintenance(tasks=['commit-graph', 'loose-objects', 'multi-pack-index'])
+    assert set(report.index) == {'SOURCE_A_2020', 'SOURCE_B_2021', 'main'}
+    assert report['error'].isna().all()
+    assert (report['loose_objects_before'] > 0).all()
+    assert (report['loose_objects_after'] == 0).all()
+    assert (report['packs_after'] == 1).all()
+    assert os.path.exists(os.path.join(datashelf, 'database', 'SOURCE_A_2020', '.git', 'objects', 'info', 'commit-graph'))
+
+    # nothing is due right after the maintenance
+    assert len(manager.run_maintenance()) == 0
+    monkeypatch.setattr(config, 'MAINTENANCE_MAX_LOOSE_OBJECTS', -1)
+    assert len(manager.run_maintenance(repoNames=['SOURCE_A_2020'])) == 1
+    manager.validate_all_sources(raise_on_error=True)
+
+
+def test_shared_object_store(datashelf):
+
+    manager = GitRepository_Manager(datashelf)
+    content = 'region,2020\n' + ''.join(f'R{i},{i * 7919 % 104729}\n' for i in range(20000))
+    for sourceID in ['SOURCE_A_2020', 'SOURCE_B_2021']:
+        manager.gitAddFile(sourceID, _write_table(datashelf, sourceID, 'raw.csv', content))
+    manager.commit('add raw data')
+    before = manager.report_disk_usage(verbose=False)
+    assert not before['shared'].any()
+
+    report = manager.share_objects()
+    assert report['shared'].all()
+    assert (report['local_size'] < before['local_size']).all()
+    assert (report['reachable_size'] > 0).all()
+    # the identical raw data is stored once
+    savings = manager.objectStore.savings(report)
+    assert savings['saved'] > 0
+
+    assert len(manager.read_table('SOURCE_B_2021', 'tables/raw.csv')) == 20000
+    manager.gitAddFile('SOURCE_A_2020', _write_table(datashelf, 'SOURCE_A_2020'))
+    manager.commit('add table')
+    manager.share_objects(['SOURCE_A_2020'])
+    GitRepository_Manager(datashelf).validate_all_sources(raise_on_error=True)
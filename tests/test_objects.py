@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the pooled cat-file object access
+"""
+import git
+
+from git_datashelf.objects import ObjectPool
+
+
+def test_object_pool(tmp_path):
+
+    repos = list()
+    for name in ['a', 'b', 'c']:
+        repo = git.Repo.init(tmp_path / name)
+        with open(tmp_path / name / 'data.csv', 'w') as f:
+            f.write(f'name\n{name}\n')
+        repo.index.add(['data.csv'])
+        repo.index.commit('add data')
+        repos.append(repo)
+
+    pool = ObjectPool(max_size=2, idle_timeout=60)
+    objects = pool.get(repos[0].git_dir)
+    hexsha = repos[0].head.commit.hexsha
+    assert objects.info('HEAD^{commit}')[:2] == (hexsha, 'commit')
+    assert objects.read('HEAD:data.csv')[1:] == ('blob', b'name\na\n')
+    assert objects.read('HEAD:missing.csv') is None
+    assert pool.get(repos[0].git_dir) is objects
+
+    # least recently used repositories are closed
+    for repo in repos[1:]:
+        pool.get(repo.git_dir).info('HEAD')
+    assert len(pool) == 2
+    assert repos[0].git_dir not in pool.entries
+    assert objects.processes == {}
+
+    # idle processes are closed
+    pool.idle_timeout = 0
+    pool.close_idle()
+    assert len(pool) == 0
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the source registry backends
+"""
+import os
+import pytest
+
+from git_datashelf import config
+from git_datashelf.registry import get_source_registry
+
+
+@pytest.mark.parametrize('backend', ['csv', 'sqlite'])
+def test_registry_upsert_and_flush(tmp_path, backend):
+
+    os.mkdir(tmp_path / '.git')
+    sourceFile = str(tmp_path / 'sources.csv')
+    with open(sourceFile, 'w') as f:
+        f.write(','.join(config.SOURCE_META_FIELDS) + '\n')
+
+    registry = get_source_registry(sourceFile, backend=backend)
+    registry.upsert('B_2021', {'SOURCE_ID': 'B_2021', 'licence': 'CC-BY', 'unknown': 1}, replace=True)
+    registry.upsert('A_2020', {'licence': 'MIT'})
+    registry.upsert('B_2021', {'git_commit_hash': 'abc', 'tag': 'v1.0'})
+
+    assert list(registry.to_dataframe().index) == ['B_2021', 'A_2020']
+    assert registry.to_dataframe().loc['B_2021', 'licence'] == 'CC-BY'
+    assert 'unknown' not in registry.to_dataframe().columns
+
+    registry.flush()
+    registry.close()
+    with open(sourceFile) as f:
+        content = f.read()
+    assert content.splitlines()[1] == 'B_2021,,,,CC-BY,abc,v1.0'
+
+    registry = get_source_registry(sourceFile, backend=backend)
+    assert registry.get('B_2021', 'tag') == 'v1.0'
+    assert registry.get('A_2020', 'tag') is None
+    registry.flush()
+    with open(sourceFile) as f:
+        assert f.read() == content
+
+
+def test_sqlite_registry_stores_only_flushed_rows(tmp_path):
+
+    os.mkdir(tmp_path / '.git')
+    sourceFile = str(tmp_path / 'sources.csv')
+    with open(sourceFile, 'w') as f:
+        f.write(','.join(config.SOURCE_META_FIELDS) + '\n')
+
+    registry = get_source_registry(sourceFile, backend='sqlite')
+    registry.upsert('A_2020', {'licence': 'MIT'})
+
+    # other processes do not load rows before the flush
+    other = get_source_registry(sourceFile, backend='sqlite')
+    assert 'A_2020' not in other
+    other.close()
+
+    registry.flush()
+    registry.close()
+    registry = get_source_registry(sourceFile, backend='sqlite')
+    assert registry.get('A_2020', 'licence') == 'MIT'
+    assert not registry.modified
+
+    # a flush only stores the modified rows
+    registry.upsert('B_2021', {'licence': 'CC-BY'})
+    registry.flush()
+    statements = list()
+    registry.connection.set_trace_callback(statements.append)
+    registry.upsert('A_2020', {'tag': 'v1.0'})
+    registry.flush()
+    stored = [statement for statement in statements if 'sources' in statement]
+    assert len(stored) == 1 and 'A_2020' in stored[0] and 'DELETE' not in stored[0]
+    registry.close()
+
+    registry = get_source_registry(sourceFile, backend='sqlite')
+    assert registry.get('A_2020', 'tag') == 'v1.0'
+    assert registry.get('B_2021', 'tag') is None
+    assert list(registry) == ['A_2020', 'B_2021']
+    registry.close()
+
+
+@pytest.mark.parametrize('backend', ['csv', 'sqlite'])
+def test_registry_refresh_keeps_own_upserts(tmp_path, backend):
+
+    os.mkdir(tmp_path / '.git')
+    sourceFile = str(tmp_path / 'sources.csv')
+    with open(sourceFile, 'w') as f:
+        f.write(','.join(config.SOURCE_META_FIELDS) + '\n')
+    first = get_source_registry(sourceFile, backend='csv')
+    second = get_source_registry(sourceFile, backend=backend)
+    assert not second.refresh()
+
+    first.upsert('A_2020', {'git_commit_hash': 'aaa'})
+    first.flush()
+    second.upsert('B_2021', {'git_commit_hash': 'bbb'})
+    assert second.refresh()
+    assert second.get('A_2020', 'git_commit_hash') == 'aaa'
+    assert second.get('B_2021', 'git_commit_hash') == 'bbb'
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the concurrent push and pull against local bare repositories
+"""
+import asyncio
+import os
+import threading
+import time
+import git
+import pandas as pd
+import pytest
+
+from git_datashelf import GitRepository_Manager
+from conftest import push_remote_commit
+
+SOURCES = ['SOURCE_A_2020', 'SOURCE_B_2021']
+
+
+def test_push_many(remote_datashelf, tmp_path):
+
+    manager = GitRepository_Manager(remote_datashelf)
+    for sourceID in SOURCES:
+        filePath = os.path.join(remote_datashelf, 'database', sourceID, 'tables', 'data.csv')
+        with open(filePath, 'w') as f:
+            f.write('region,2020\nDEU,1\n')
+        manager.gitAddFile(sourceID, filePath)
+    manager.commit('add tables')
+
+    asyncio.run(manager.push_many(SOURCES, max_concurrency=2))
+
+    states = pd.read_csv(
+        os.path.join(remote_datashelf, 'remote_sources', 'source_states.csv'), index_col=0
+    )
+    for sourceID in SOURCES:
+        remote = git.Repo(tmp_path / 'remote' / (sourceID + '.git'))
+        hexsha = manager.sources.loc[sourceID, 'git_commit_hash']
+        assert remote.head.commit.hexsha == hexsha
+        assert remote.tags['v2.0'].commit.hexsha == hexsha
+        assert manager.sources.loc[sourceID, 'tag'] == 'v2.0'
+        assert states.loc[sourceID, 'tag'] == 'v2.0'
+
+    remote_sources = git.Repo(tmp_path / 'remote' / 'remote_sources.git')
+    assert remote_sources.head.commit.message.startswith('remote source update')
+
+
+def test_push_and_pull_many_read_only(remote_datashelf):
+
+    manager = GitRepository_Manager(remote_datashelf, read_only=True)
+    for method in [manager.push_many, manager.pull_many]:
+        with pytest.raises(RuntimeError, match='read-only'):
+            asyncio.run(method(SOURCES))
+
+
+def test_pull_many(remote_datashelf, tmp_path):
+
+    commits = {
+        sourceID: push_remote_commit(
+            tmp_path, tmp_path / 'remote' / (sourceID + '.git'), 'tables/new.csv', 'a,b\n'
+        )
+        for sourceID in SOURCES
+    }
+
+    manager = GitRepository_Manager(remote_datashelf)
+    asyncio.run(manager.pull_many(SOURCES))
+    for sourceID, commit in commits.items():
+        assert manager.sources.loc[sourceID, 'git_commit_hash'] == commit.hexsha
+
+
+def test_clone_sources_from_remote(remote_datashelf, tmp_path, monkeypatch):
+
+    from git_datashelf import config, create_empty_datashelf
+
+    monkeypatch.setattr(config, 'DATASHELF_REMOTE', 'file://' + str(tmp_path / 'remote') + os.sep)
+    shelf = str(tmp_path / 'new_datashelf')
+    create_empty_datashelf(shelf)
+    manager = GitRepository_Manager(shelf)
+    repos = manager.clone_sources_from_remote(SOURCES, max_workers=2, depth=1)
+
+    assert sorted(repos) == SOURCES
+    for sourceID, repo in repos.items():
+        assert os.path.exists(os.path.join(repo.git_dir, 'shallow'))
+        assert manager.sources.loc[sourceID, 'tag'] == 'v1.0'
+
+    main = git.Repo(shelf)
+    assert main.head.commit.message.startswith('cloned 2 sources')
+    GitRepository_Manager(shelf).validate_all_sources(raise_on_error=True)
+
+
+def test_clone_with_shared_object_store(remote_datashelf, tmp_path, monkeypatch):
+
+    from git_datashelf import config, create_empty_datashelf
+
+    monkeypatch.setattr(config, 'SHARED_OBJECT_STORE', True)
+    shelf = str(tmp_path / 'new_datashelf')
+    create_empty_datashelf(shelf)
+    manager = GitRepository_Manager(shelf)
+    manager.objectStore.init()
+    repos = manager.clone_sources_from_remote(SOURCES, max_workers=2)
+
+    report = manager.report_disk_usage(verbose=False)
+    assert report['shared'].all()
+    for sourceID, repo in repos.items():
+        assert os.path.exists(os.path.join(repo.git_dir, 'objects', 'info', 'alternates'))
+    GitRepository_Manager(shelf).validate_all_sources(raise_on_error=True)
+
+
+def test_concurrent_remote_source_updates(remote_datashelf, monkeypatch):
+
+    first = GitRepository_Manager(remote_datashelf)
+    first._pull_remote_sources()
+    second = GitRepository_Manager(remote_datashelf)
+    for manager, sourceID in [(first, 'SOURCE_A_2020'), (second, 'SOURCE_B_2021')]:
+        filePath = os.path.join(remote_datashelf, 'database', sourceID, 'tables', 'data.csv')
+        with open(filePath, 'w') as f:
+            f.write('region,2020\nDEU,1\n')
+        manager.gitAddFile(sourceID, filePath)
+        manager.commit('add table')
+
+    # the first writer updates its source while the second one holds the
+    # states it read
+    set_state = GitRepository_Manager._set_remote_source_state
+    writer = threading.Thread(target=first._update_remote_sources, args=('SOURCE_A_2020',))
+
+    def set_state_concurrently(self, repoName, rem_sources_df):
+        writer.start()
+        time.sleep(0.5)
+        return set_state(self, repoName, rem_sources_df)
+
+    monkeypatch.setattr(second, '_set_remote_source_state', set_state_concurrently.__get__(second))
+    second._update_remote_sources('SOURCE_B_2021')
+    writer.join()
+
+    states = pd.read_csv(
+        os.path.join(remote_datashelf, 'remote_sources', 'source_states.csv'), index_col=0
+    )
+    assert states.loc['SOURCE_A_2020', 'tag'] == 'v2.0'
+    assert states.loc['SOURCE_B_2021', 'tag'] == 'v2.0'
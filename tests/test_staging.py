@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the batched staging of files
+"""
+import os
+import git
+import pytest
+
+from git_datashelf.staging import stage_files
+
+
+def test_stage_files(tmp_path):
+
+    repo = git.Repo.init(tmp_path)
+    os.makedirs(tmp_path / 'tables')
+    for name in ['a.csv', 'b.csv']:
+        (tmp_path / 'tables' / name).write_text(f'{name}\n')
+
+    staged = stage_files(
+        repo, [tmp_path / 'tables' / 'a.csv', 'tables/a.csv', str(tmp_path / 'tables')]
+    )
+    assert sorted(staged) == [os.path.join('tables', 'a.csv'), os.path.join('tables', 'b.csv')]
+    assert set(path for path, stage in repo.index.entries) == {'tables/a.csv', 'tables/b.csv'}
+    assert repo.untracked_files == [] and not repo.index.diff(None)
+
+    # unchanged files are skipped once the index is older than the files
+    index_mtime = os.stat(os.path.join(repo.git_dir, 'index')).st_mtime
+    for name in ['a.csv', 'b.csv']:
+        os.utime(tmp_path / 'tables' / name, (index_mtime - 10, index_mtime - 10))
+    stage_files(repo, ['tables/a.csv', 'tables/b.csv'])  # records the new stat information
+    assert stage_files(repo, ['tables/a.csv', 'tables/b.csv']) == []
+
+    (tmp_path / 'tables' / 'b.csv').write_text('modified content\n')
+    assert stage_files(repo, ['tables/a.csv', 'tables/b.csv']) == [os.path.join('tables', 'b.csv')]
+    assert repo.index.entries[('tables/b.csv', 0)].binsha == git.Blob(
+        repo, bytes.fromhex(repo.git.hash_object('tables/b.csv'))
+    ).binsha
+
+    with pytest.raises(ValueError):
+        stage_files(repo, [tmp_path.parent / 'outside.csv'])
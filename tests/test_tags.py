@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the tag index
+"""
+import os
+import time
+import git
+
+from git_datashelf.tags import TagIndex, read_head
+
+
+def test_tag_index(tmp_path):
+
+    repo = git.Repo.init(tmp_path)
+    with repo.config_writer() as writer:
+        writer.set_value('user', 'name', 'tester')
+        writer.set_value('user', 'email', 'tester@example.org')
+    first = repo.index.commit('first')
+    repo.create_tag('v1.0')
+    second = repo.index.commit('second')
+    repo.create_tag('v2.0', message='annotated release')
+    repo.create_tag('release')
+
+    tagIndex = TagIndex(repo.git_dir).refresh()
+    assert read_head(repo.git_dir) == second.hexsha
+    assert tagIndex.tag_at(first.hexsha) == 'v1.0'
+    assert tagIndex.tag_at(second.hexsha) == 'v2.0'
+    assert tagIndex.latest_tag() == ('v2.0', second.hexsha)
+
+    # packed refs are read identically and changes invalidate the index
+    repo.git.pack_refs('--all')
+    third = repo.index.commit('third')
+    repo.create_tag('v10.0')
+    tagIndex.refresh()
+    assert tagIndex.tag_at(second.hexsha) == 'v2.0'
+    assert tagIndex.latest_tag() == ('v10.0', third.hexsha)
+    assert read_head(repo.git_dir) == third.hexsha
+
+
+def test_tag_index_only_rescans_changed_refs(tmp_path, monkeypatch):
+
+    repo = git.Repo.init(tmp_path)
+    with repo.config_writer() as writer:
+        writer.set_value('user', 'name', 'tester')
+        writer.set_value('user', 'email', 'tester@example.org')
+    first = repo.index.commit('first')
+    repo.create_tag('v1.0')
+    repo.create_tag('group/v1.0')
+
+    # refs older than the timestamp granularity
+    past = time.time() - 10
+    tagsPath = os.path.join(repo.git_dir, 'refs', 'tags')
+    for path in [tagsPath, os.path.join(tagsPath, 'group')]:
+        os.utime(path, (past, past))
+    tagIndex = TagIndex(repo.git_dir).refresh().refresh()
+
+    with monkeypatch.context() as m:
+        # unchanged refs are neither listed nor rebuilt
+        m.setattr(TagIndex, 'build', lambda self, state=None: 1 / 0)
+        m.setattr(os, 'walk', lambda *args, **kwargs: 1 / 0)
+        assert tagIndex.refresh().tags['v1.0'][0] == first.hexsha
+
+    # new and moved tags are detected by the directory mtimes
+    second = repo.index.commit('second')
+    repo.create_tag('group/v2.0')
+    assert tagIndex.refresh().tags['group/v2.0'][0] == second.hexsha
+    repo.create_tag('v1.0', force=True)
+    assert tagIndex.refresh().tags['v1.0'][0] == second.hexsha
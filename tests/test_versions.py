@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the cached queries of older source versions
+"""
+import os
+import pandas as pd
+
+from git_datashelf import GitRepository_Manager
+from git_datashelf.versions import VersionCache, memory_size
+from conftest import write_inventory
+
+
+def test_inventory_and_tables_at_versions(datashelf):
+
+    manager = GitRepository_Manager(datashelf)
+    repo = manager['SOURCE_A_2020']
+    tablePath = os.path.join(datashelf, 'database', 'SOURCE_A_2020', 'tables', 'data.csv')
+    pd.DataFrame({'region': ['DEU'], '2020': [1]}).to_csv(tablePath, index=False)
+    manager.gitAddFile('SOURCE_A_2020', tablePath)
+    manager.gitAddFile('SOURCE_A_2020', write_inventory(datashelf, 'SOURCE_A_2020', ['GDP']))
+    manager.commit('first version')
+    repo.create_tag('v1.0')
+    pd.DataFrame({'region': ['DEU'], '2020': [2]}).to_csv(tablePath, index=False)
+    manager.gitAddFile('SOURCE_A_2020', tablePath)
+    manager.gitAddFile('SOURCE_A_2020', write_inventory(datashelf, 'SOURCE_A_2020', ['GDP', 'Population']))
+    manager.commit('second version')
+
+    assert list(manager.inventory_at('SOURCE_A_2020', 'v1.0')['variable']) == ['GDP']
+    assert len(manager.inventory_at('SOURCE_A_2020')) == 2
+    assert manager.table_at('SOURCE_A_2020', 'tables/data.csv', 'v1.0').loc[0, '2020'] == 1
+    assert manager.versionCache.stats()['misses'] == 3
+
+    # repeated queries are served from the cache without git I/O
+    manager.instrumentation.enable()
+    manager.inventory_at('SOURCE_A_2020', 'v1.0')
+    manager.table_at('SOURCE_A_2020', 'tables/data.csv', 'v1.0')
+    assert 'read_blob' not in set(manager.instrumentation.to_dataframe()['operation'])
+    stats = manager.versionCache.stats()
+    assert (stats['hits'], stats['items']) == (2, 3)
+
+
+def test_version_cache_is_bounded():
+
+    table = pd.DataFrame({'value': range(100)})
+    size = memory_size(table)
+    cache = VersionCache(max_bytes=int(size * 2.5))
+    for key in ['a', 'b', 'c']:
+        cache.put(key, table)
+    assert cache.get('a') is None
+    assert cache.get('c') is table
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] == 2 * size